@@ -1,6 +1,75 @@
+import json
+import os
 import requests
-import pprint
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
 from json import JSONDecodeError
+from urllib.parse import urlencode
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# connection pool size per host; large enough for concurrent pushes to reuse keep-alive connections
+POOL_SIZE = 32
+
+# maximum number of GET responses kept for conditional (ETag) revalidation, per api client
+ETAG_CACHE_SIZE = 256
+
+# retry idempotent requests on transient gateway errors, and when rate limited by the server
+# (with exponential backoff, waiting for at least as long as a Retry-After response header asks)
+RETRY = Retry(total=3, backoff_factor=0.2, status_forcelist=[429, 502, 503, 504], raise_on_status=False)
+
+
+@lru_cache(maxsize=256)
+def _build_url(base_url, path, trailing_slash):
+    """
+    Construct absolute url from base url and relative api path
+    Cached, since the same endpoint paths are requested repeatedly
+    :param base_url: base url of api
+    :param path: endpoint path (may or may not have starting slash)
+    :param trailing_slash: True if url should end with a slash
+    :return: absolute url
+    :rtype: str
+    """
+    url = base_url + '/' + path.strip('/')
+    if trailing_slash:
+        url += '/'
+    return url
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter
+    Requests only wait when they are issued faster than the configured rate (after an initial burst)
+    """
+    def __init__(self, rate, capacity=None):
+        """
+        :param rate: sustained request rate (requests per second)
+        :param capacity: maximum burst size, defaults to one second worth of requests
+        """
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self.tokens = self.capacity
+        self.timestamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take a token, sleeping until one is available if the bucket is empty
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.timestamp) * self.rate)
+            self.timestamp = now
+            if self.tokens < 1:
+                delay = (1 - self.tokens) / self.rate
+                time.sleep(delay)
+                self.timestamp += delay
+                self.tokens = 1
+            self.tokens -= 1
+
 
 class ApiClient:
     """
@@ -9,34 +78,48 @@ class ApiClient:
     api_path = None  # populated in subclass
     trailing_slash = False  # override in subclass if needed
 
-    def __init__(self, host, token):
+    def __init__(self, host, token, rate_limit=None):
+        """
+        :param host: base URL of application
+        :param token: API token
+        :param rate_limit: maximum sustained request rate (requests per second), or 0 to disable rate limiting;
+            defaults to ALOSI_REQUEST_RATE env variable if set (and not empty), otherwise requests are not rate limited
+        """
         self.host = host
         self.base_url = self.host + self.api_path
         self.client = self._get_client(token)
+        # LRU cache of {(url, query string): (etag, status code, content, headers)} used for conditional GET requests
+        self._etag_cache = OrderedDict()
+        self._etag_cache_lock = threading.Lock()
+        if rate_limit is None:
+            rate_limit = float(os.environ.get('ALOSI_REQUEST_RATE') or 0)
+        self.rate_limiter = TokenBucket(rate_limit) if rate_limit else None
 
     @staticmethod
     def _get_client(token=None):
         """
-        Constructs a request.Session with auth header
+        Constructs a request.Session with auth header, and a connection pool sized for concurrent requests
         :param token: API key
         :rtype: requests.Session
         """
         client = requests.Session()
         headers = {'Authorization': 'Token {}'.format(token)} if token else {}
         client.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=RETRY)
+        client.mount('https://', adapter)
+        client.mount('http://', adapter)
         return client
 
     def _absolute_url(self, path):
         """
         Construct absolute url given a relative api path
-        :param path: endpoint path (may or may not have starting slash)
+        :param path: endpoint path (may or may not have starting slash), or an absolute url, e.g. a "next" page link
         :return: absolute url
         :rtype: str
         """
-        url = self.base_url + '/' + path.strip('/')
-        if self.trailing_slash:
-            url += '/'
-        return url
+        if path.startswith(('http://', 'https://')):
+            return path
+        return _build_url(self.base_url, path, self.trailing_slash)
 
     def prepare(self, method, path, **kwargs):
         """
@@ -53,68 +136,81 @@ class ApiClient:
     def request(self, method, path, **kwargs):
         """
         Makes a generic request using client and base url
+        GET responses that include an ETag are cached and revalidated with If-None-Match on subsequent requests;
+        if the server reports that the resource is unchanged (304), a response is rebuilt from the cached content
         :param method: HTTP method, e.g. 'GET'
-        :param path: endpoint path, e.g. 'activity' or '/knowledge_component'
+        :param path: endpoint path, e.g. 'activity' or '/knowledge_component', or an absolute url
         :param kwargs: keyword arguments to pass to requests.request()
         :rtype: requests.Response
         """
-        request = self.prepare(method, path, **kwargs)
-        return self.client.send(request)
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        url = self._absolute_url(path)
+        if method.upper() != 'GET':
+            return self.client.request(method, url, **kwargs)
+
+        params = kwargs.get('params') or {}
+        cache_key = (url, params if isinstance(params, (str, bytes)) else urlencode(params, doseq=True))
+        with self._etag_cache_lock:
+            cached = self._etag_cache.get(cache_key)
+            if cached:
+                self._etag_cache.move_to_end(cache_key)
+        if cached:
+            kwargs['headers'] = {'If-None-Match': cached[0], **(kwargs.get('headers') or {})}
+        response = self.client.request(method, url, **kwargs)
+        if cached and response.status_code == 304:
+            etag, response.status_code, response._content, headers = cached
+            response.headers.update(headers)
+            return response
+        if response.ok and 'ETag' in response.headers:
+            with self._etag_cache_lock:
+                self._etag_cache[cache_key] = (
+                    response.headers['ETag'], response.status_code, response.content, dict(response.headers)
+                )
+                self._etag_cache.move_to_end(cache_key)
+                if len(self._etag_cache) > ETAG_CACHE_SIZE:
+                    self._etag_cache.popitem(last=False)
+        return response
+
+    def paginate(self, response):
+        """
+        Iterate through all results from paginated list api view
+        Results are yielded one page at a time, so callers can consume them without collecting every page into a list
+        :param response: response from first page
+        :type response: requests.Response
+        """
+        if not response.ok:
+            raise ApiError(response)
+        page = response.json()
+        if 'results' not in page:
+            raise Exception('Paginator: "results" key not found in page')
+        yield from page['results']
+        while page['next']:
+            response = self.request('GET', page['next'])
+            if not response.ok:
+                raise ApiError(response)
+            page = response.json()
+            yield from page['results']
 
 
 class ApiError(Exception):
     def __init__(self, response, message=''):
         self.response = response
         self.message = message
+        self._str = None  # formatted message, built on first use
 
     def __str__(self):
-        try:
-            pp = pprint.PrettyPrinter(indent=2)
-            response_data = pp.pformat(self.response.json())
-        except JSONDecodeError:
-            response_data = self.response.text
-
-        return (
-            f"{self.message}\n"
-            f"Request: \n"
-            f"{self.response.request.method} {self.response.request.url}\n"
-            f"Response: {self.response.status_code}\n"
-            f"{response_data}"
-        )
-
-
-def _log_request(request, response):
-    """Log info about a HTTP request
-    
-    :param request: Requests request
-    :param response: Requests response. Optional for dry runs where response not available
-    :param response: [type], optional
-    :raises ApiError: [description]
-    """
-
-    request_metadata = [request.method, request.url]  #f'{request.method} {request.url}'
-    request_data = request.body if request.method in ['POST', 'PUT'] else None
-    # if response:
-    request_metadata.append(str(response.status_code))
-
-    # determine logging level based on response status
-    if response.ok:
-        log_level = log.debug
-    else:
-        log_level = log.error
-
-    # else:
-
-        # assume dry run if no response
-        # log.info(f'(dry run) {request.method} {request.url}')
-        # request_metadata = ['(dry run)'] + request_metadata  # f'(dry run) {request_metadata}'
-        # log_level = log.info
-
-    log_level(' '.join(request_metadata))
-    if request_data:
-        log_level(request_data)
-    if response:
-        if response.ok:
-            log_level(response.json())
-        else:
-            raise ApiError(request, response)
\ No newline at end of file
+        if self._str is None:
+            try:
+                response_data = json.dumps(self.response.json(), indent=2)
+            except JSONDecodeError:
+                response_data = self.response.text
+
+            self._str = (
+                f"{self.message}\n"
+                f"Request: \n"
+                f"{self.response.request.method} {self.response.request.url}\n"
+                f"Response: {self.response.status_code}\n"
+                f"{response_data}"
+            )
+        return self._str
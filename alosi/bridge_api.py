@@ -8,13 +8,11 @@ class BridgeApi(ApiClient):
     api_path = "/api"
     trailing_slash = True
 
-    def __init__(self, host="http://localhost:8008", token=None):
-        super().__init__(host, token)
+    def __init__(self, host="http://localhost:8008", token=None, rate_limit=None):
+        super().__init__(host, token, rate_limit=rate_limit)
 
     def get_collection(self, pk):
-        return self.client.get(
-            self._absolute_url("collection/{}".format(pk))
-        )
+        return self.request('GET', "collection/{}".format(pk))
 
     def create_collection(self, **kwargs):
         """
@@ -25,30 +23,16 @@ class BridgeApi(ApiClient):
             owner
             slug
         """
-        return self.client.post(
-            self._absolute_url('collection'),
-            json=kwargs
-        )
+        return self.request('POST', 'collection', json=kwargs)
 
     def delete_collection(self, **kwargs):
-        return self.client.delete(
-            self._absolute_url('collection'),
-            json=kwargs
-        )
+        return self.request('DELETE', 'collection', json=kwargs)
 
     def get_activity(self, pk):
-        return self.client.get(
-            "{}/activity/{}".format(self.base_url, pk)
-        )
+        return self.request('GET', "activity/{}".format(pk))
 
     def create_activity(self, **kwargs):
-        return self.client.post(
-            self._absolute_url('activity'),
-            json=kwargs
-        )
+        return self.request('POST', 'activity', json=kwargs)
 
     def delete_activity(self, **kwargs):
-        return self.client.delete(
-            self._absolute_url('activity'),
-            json=kwargs
-        )
+        return self.request('DELETE', 'activity', json=kwargs)
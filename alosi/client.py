@@ -1,10 +1,14 @@
+from collections import defaultdict
 from .bridge_api import BridgeApi
 from .engine_api import EngineApi
-from .models import Activity, Collection, KnowledgeComponent
+from .models import Activity, Collection, KnowledgeComponent, map_concurrently
 
+# minimum number of KC's to push before their data is seeded from one unfiltered list request;
+# below this, an individual GET per KC (filtered by kc_id) is cheaper than listing every KC in the engine
+KC_LIST_THRESHOLD = 20
 
 class AlosiClient:
-    def __init__(self, *, bridge_host=None, bridge_token=None, bridge_owner_pk=None, engine_host=None, engine_token=None, content_source_pk=None, enabled=None):
+    def __init__(self, *, bridge_host=None, bridge_token=None, bridge_owner_pk=None, engine_host=None, engine_token=None, content_source_pk=None, enabled=None, max_workers=8):
         """
         Initialize client with configuration and credentials.
         For some use cases involving subsets of systems, some groups of parameters may not be needed
@@ -16,6 +20,9 @@ class AlosiClient:
         :param content_source_pk: Primary key of content source associated with created activities
         :param engine_host: Base URL of engine application
         :param engine_token: API token for engine
+        :param max_workers: maximum number of threads used to push objects concurrently
+            (shared by nested concurrent pushes, e.g. collections and their activities)
+        :type max_workers: int
         """
         # enabled clients tracks which API interfaces are enabled based on
         # presence of required input parameters. Could be passed in explicitly
@@ -28,6 +35,7 @@ class AlosiClient:
             self.enabled.add('engine')
         self.bridge_owner_pk = bridge_owner_pk
         self.content_source_pk = 1
+        self.max_workers = max_workers
 
     def Activity(self, *args, **kwargs):
         """Activity factory method with reference to client
@@ -61,11 +69,62 @@ class AlosiClient:
         :param knowledge_components: knowledge components
         :type knowledge_components: list KnowledgeComponent
         """
-        # necessary KC's would be created during activity_set push, but explicit update will catch orphan KC's not associated with any other activity/kc
-        # for kc in knowledge_components:
-        #     kc.push()
+        # create KC's up front (including KC's only referenced by activities), so that concurrent collection pushes
+        # below don't race to create shared KC's
+        # explicit update will also catch orphan KC's not associated with any other activity/kc
+        if 'engine' in self.enabled:
+            self._push_knowledge_components(list(dict.fromkeys(
+                [*knowledge_components, *(kc for activity in activities for kc in activity.knowledge_components)]
+            )))
 
-        for collection in collections:
+        # group activities by collection (identity) in a single pass
+        activity_sets = defaultdict(list)
+        for activity in activities:
+            activity_sets[id(activity.collection)].append(activity)
+
+        def push_collection(collection):
             # this also has the effect of initializing the activities and tagging / kc dependencies if they are not already initialized
-            activity_set = [activity for activity in activities if activity.collection is collection]
-            collection.push(activity_set)
+            collection.push(activity_sets.get(id(collection), []))
+
+        # collections are independent of each other, so push them concurrently to overlap network round trips
+        # (threads are shared with the concurrent engine/bridge and activity pushes within each collection)
+        map_concurrently(push_collection, collections, self.max_workers)
+
+    def _push_knowledge_components(self, knowledge_components):
+        """
+        Push knowledge components (and their prerequisites) in waves, where each wave only contains KC's whose
+        prerequisites have already been pushed, so KC's in a wave can be pushed concurrently without racing to
+        create shared prerequisites
+
+        :param knowledge_components: knowledge components
+        :type knowledge_components: list KnowledgeComponent
+        """
+        # include prerequisites of prerequisites etc., so that they are only created in their own wave
+        pending = {}
+        stack = list(knowledge_components)
+        while stack:
+            kc = stack.pop()
+            if kc not in pending:
+                pending[kc] = None
+                stack.extend(kc.prerequisite_knowledge_components)
+
+        if not pending:
+            return
+
+        # populate KC data caches from a single list request, rather than an individual GET per KC
+        # (the list endpoint is the same one that EngineKnowledgeComponent.data filters by kc_id)
+        if len(pending) >= KC_LIST_THRESHOLD:
+            response = self.engine_api.request('GET', 'knowledge_component')
+            existing = {data['kc_id']: data for data in self.engine_api.paginate(response)}
+            for kc in pending:
+                kc.engine.__dict__.setdefault('data', existing.get(kc.slug))
+
+        pushed = set()
+        while pending:
+            wave = [kc for kc in pending if pushed.issuperset(kc.prerequisite_knowledge_components)]
+            # prerequisite cycle: push one KC at a time, as KnowledgeComponent.push() would
+            wave = wave or [next(iter(pending))]
+            map_concurrently(lambda kc: kc.push(), wave, self.max_workers)
+            pushed.update(wave)
+            for kc in wave:
+                del pending[kc]
@@ -1 +1 @@
-from . import google_drive, olx
+from .. import google_drive, olx
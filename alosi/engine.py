@@ -11,18 +11,17 @@ EPSILON = 1e-10
 def fillna(x, value=0.0, inplace=False):
     """
     Replace np.nan or inf elements with scalar or corresponding elements of ndarray
-    :param x:
-    :param fill_value: scalar (int/float) or np.array the same dimension as x;
-        value(s) to use to fill spots in x where element value is np.nan
-    :param copy: False if replacing inplace, True if making a copy
-    :return: np.array same size as x if inplace=True, else no return value
-    """
-    output = x.copy() if inplace else x
-    ind_to_replace = np.where(np.isnan(output) | np.isinf(output))
+    :param x: np.array
+    :param value: scalar (int/float) or np.array the same dimension as x;
+        value(s) to use to fill spots in x where element value is np.nan or inf
+    :param inplace: True if replacing inplace, False if making a copy
+    :return: np.array same size as x if inplace=False, else no return value
+    """
+    output = x if inplace else x.copy()
     if np.isscalar(value):
-        output[ind_to_replace] = value
+        np.nan_to_num(output, copy=False, nan=value, posinf=value, neginf=value)
     else:
-        output[ind_to_replace] = value[ind_to_replace]
+        np.copyto(output, value, where=~np.isfinite(output))
     return output if not inplace else None
 
 
@@ -231,6 +230,13 @@ class BaseAlosiAdaptiveEngine(BaseAdaptiveEngine):
         Calls data/param retrieval functions that may be implementation(prod vs. prototype)-specific
         TODO: could subset params based on activities in collection scope, to reduce unneeded computation
         :param learner:
+        :return: dictionary with keys from get_activity_recommend_params() and get_learner_recommend_params()
+        """
+        return dict(self.get_activity_recommend_params(), **self.get_learner_recommend_params(learner))
+
+    def get_activity_recommend_params(self):
+        """
+        Retrieve the recommendation params that are shared by all learners
         :return: dictionary with following keys:
             guess: QxK np.array, guess parameter values for activities
             slip: QxK np.array, slip parameter values for activities
@@ -242,17 +248,12 @@ class BaseAlosiAdaptiveEngine(BaseAdaptiveEngine):
             W_r: (float), weight on substrategy R
             W_d: (float), weight on substrategy D
             W_c: (float), weight on substrategy C
-            last_attempted_guess: 1xK vector of guess parameters for activity
-            last_attempted_slip: 1xK vector of slip parameters for activity
-            L: 1xK vector of learner mastery log odds values
         """
         return {
             'guess': self.get_guess(),
             'slip': self.get_slip(),
             'difficulty': self.get_difficulty(),
             'prereqs': self.get_prereqs(),
-            'last_attempted_relevance': self.get_last_attempted_relevance(learner),
-            'L': np.log(odds(self.get_learner_mastery(learner))),
             'r_star': self.get_r_star(),
             'L_star': self.get_L_star(),
             'W_p': self.get_W_p(),
@@ -261,6 +262,19 @@ class BaseAlosiAdaptiveEngine(BaseAdaptiveEngine):
             'W_c': self.get_W_c(),
         }
 
+    def get_learner_recommend_params(self, learner):
+        """
+        Retrieve the recommendation params that are specific to a learner
+        :param learner:
+        :return: dictionary with following keys:
+            learner_mastery: 1xK vector of learner mastery values
+            last_attempted_relevance: 1xK vector of relevance values for the activity last attempted by the learner
+        """
+        return {
+            'learner_mastery': self.get_learner_mastery(learner),
+            'last_attempted_relevance': self.get_last_attempted_relevance(learner),
+        }
+
     def recommend(self, learner):
         """
         Workflow:
@@ -275,6 +289,28 @@ class BaseAlosiAdaptiveEngine(BaseAdaptiveEngine):
         scores = recommendation_score(**recommendation_params)
         return np.argmax(scores)
 
+    def recommend_batch(self, learners):
+        """
+        Recommend an activity for each of several learners
+        Activity parameters are retrieved once, and the scores for all learners are computed together
+        :param learners: list of learners
+        :return: np.array of size (# learners,), index of the recommended activity for each learner
+        """
+        learner_params = [self.get_learner_recommend_params(learner) for learner in learners]
+        learner_mastery = np.array([params['learner_mastery'] for params in learner_params])
+        # learners without a last attempted activity get zero relevance, i.e. a continuity score of 0.0
+        last_attempted_relevance = np.array([
+            np.zeros(learner_mastery.shape[1]) if params['last_attempted_relevance'] is None
+            else params['last_attempted_relevance']
+            for params in learner_params
+        ])
+        scores = recommendation_score(
+            **self.get_activity_recommend_params(),
+            learner_mastery=learner_mastery,
+            last_attempted_relevance=last_attempted_relevance,
+        )
+        return np.argmax(scores, axis=0)
+
     def update_from_score(self, learner, activity, score):
         """
         Action to take when new score information is received
@@ -284,10 +320,9 @@ class BaseAlosiAdaptiveEngine(BaseAdaptiveEngine):
         :return:
         """
         mastery = self.get_learner_mastery(learner)
-        guess = self.get_guess(activity)
-        slip = self.get_slip(activity)
+        log_x0, log_x1 = self.get_mastery_update_factors(activity)
         transit = self.get_transit(activity)
-        new_mastery = calculate_mastery_update(mastery, score, guess, slip, transit)
+        new_mastery = calculate_mastery_update_from_factors(mastery, score, log_x0, log_x1, transit)
         # save new mastery values in mastery data store
         self.update_learner_mastery(learner, new_mastery)
         # save the new score in score data store
@@ -312,8 +347,28 @@ class BaseAlosiAdaptiveEngine(BaseAdaptiveEngine):
         self.update_transit(new_params['trans'])
         self.update_guess(new_params['guess'])
         self.update_slip(new_params['slip'])
+        self.clear_mastery_update_factors()
         return new_params
 
+    def get_mastery_update_factors(self, activity):
+        """
+        Get the guess/slip dependent factors of the mastery update for an activity (see mastery_update_factors())
+        Factors are cached per activity, since guess/slip parameters only change when the engine is trained
+        Engines that update guess/slip parameters outside of train() should call clear_mastery_update_factors()
+        :param activity: activity id used as input to get_guess(), get_slip()
+        :return: tuple (log_x0, log_x1) of 1 x (# LOs) np.array vectors
+        """
+        cache = self.__dict__.setdefault('_mastery_update_factors', {})
+        if activity not in cache:
+            cache[activity] = mastery_update_factors(self.get_guess(activity), self.get_slip(activity))
+        return cache[activity]
+
+    def clear_mastery_update_factors(self):
+        """
+        Clear cached mastery update factors, e.g. after guess/slip parameters are updated
+        """
+        self.__dict__.pop('_mastery_update_factors', None)
+
 
 def x0_mult(guess, slip):
     """
@@ -335,6 +390,18 @@ def x1_0_mult(guess, slip):
     return ((1.0+guess)/(guess*(1.0+slip)))/x0_mult(guess,slip)
 
 
+def mastery_update_factors(guess, slip):
+    """
+    Compute the factors of the mastery odds update that only depend on activity guess/slip parameters, in log space
+    The increment of odds due to evidence of a score is x0 * x1**score = exp(log_x0 + score*log_x1)
+    (x1 is x1_0_mult(guess, slip), which simplifies to 1/(guess*slip))
+    :param guess: 1xL np.array vector of guess parameters for activity
+    :param slip: 1xL np.array vector of slip parameters for activity
+    :return: tuple (log_x0, log_x1) of 1xL np.array vectors
+    """
+    return np.log(x0_mult(guess, slip)), -np.log(guess * slip)
+
+
 def calculate_mastery_update(mastery, score, guess, slip, transit, epsilon=EPSILON):
     """
     Calculate bayesian update of learner mastery odds based on new score information
@@ -346,18 +413,33 @@ def calculate_mastery_update(mastery, score, guess, slip, transit, epsilon=EPSIL
     :param epsilon: smallest value of mastery probability to allow
     :return: 1xL np.array vector of new masteries for learner
     """
+    log_x0, log_x1 = mastery_update_factors(guess, slip)
+    return calculate_mastery_update_from_factors(mastery, score, log_x0, log_x1, transit)
+
+
+def calculate_mastery_update_from_factors(mastery, score, log_x0, log_x1, transit):
+    """
+    Calculate bayesian update of learner mastery odds, using precomputed activity factors (see mastery_update_factors())
+    :param mastery: 1xL np.array vector of current mastery odds values for learner
+    :param score: float, score value for activity between 0.0 and 1.0
+    :param log_x0: 1xL np.array vector, log of x0 factor for activity
+    :param log_x1: 1xL np.array vector, log of x1 factor for activity
+    :param transit: 1xL np.array vector of transit parameters for activity
+    :return: 1xL np.array vector of new masteries for learner
+    """
     # The increment of odds due to evidence of the problem, but before the transfer
-    x = x0_mult(guess, slip) * np.power(x1_0_mult(guess, slip), score)
+    # (one exp per LO, rather than a power with a float exponent)
+    x = np.exp(log_x0 + score*log_x1)
     # Mastery odds update rule
     new_mastery_odds = transit + (transit + 1) * (mastery * x)
-    # Clean up invalid values
-    new_mastery_odds[np.where(np.isposinf(new_mastery_odds))] = odds(1.0)
-    new_mastery_odds[np.where(new_mastery_odds == 0.0)] = odds(0.0)
+    # Clean up invalid values (boolean masks, without building index arrays)
+    new_mastery_odds[np.isposinf(new_mastery_odds)] = odds(1.0)
+    new_mastery_odds[new_mastery_odds == 0.0] = odds(0.0)
     return new_mastery_odds
 
 
 def recommendation_score(*, guess, slip, learner_mastery, prereqs, r_star, L_star, difficulty, W_p, W_r, W_d, W_c,
-                         last_attempted_guess=None, last_attempted_slip=None):
+                         last_attempted_relevance=None, last_attempted_guess=None, last_attempted_slip=None):
     """
     Computes recommendation scores for activities
     Typically use something like get_recommend_params() to generate input arguments; params can be passed in any order
@@ -366,9 +448,10 @@ def recommendation_score(*, guess, slip, learner_mastery, prereqs, r_star, L_sta
         R: Remediation / demand
         D: Appropirate Difficulty
         C: Continuity
+    Scores for several learners can be computed at once by passing learner values as matrices with a row per learner
     :param guess: QxK matrix of item-KC guess values
     :param slip: QxK matrix of item-KC slip values
-    :param learner_mastery: 1xK vector of learner mastery odds values
+    :param learner_mastery: 1xK vector (or NxK matrix, for N learners) of learner mastery odds values
     :param prereqs: QxQ np.array, prerequisite matrix
     :param r_star: Threshold for forgiving lower odds of mastering pre-requisite LOs.
     :param L_star: Threshold logarithmic odds. If mastery logarithmic odds are >= than L_star, the LO is considered mastered
@@ -377,35 +460,39 @@ def recommendation_score(*, guess, slip, learner_mastery, prereqs, r_star, L_sta
     :param W_r: (float), weight on substrategy R
     :param W_d: (float), weight on substrategy D
     :param W_c: (float), weight on substrategy C
-    :param last_attempted_relevance: 1xK vector of computed relevance values for activity
-    :return: np.array of size (Q,) representing [1 x (# activities)] vector of activity recommendation score values
+    :param last_attempted_relevance: 1xK vector (or NxK matrix) of computed relevance values for last attempted activity
+    :param last_attempted_guess: 1xK vector of guess values for last attempted activity,
+        used to compute relevance if last_attempted_relevance is not given
+    :param last_attempted_slip: 1xK vector of slip values for last attempted activity
+    :return: np.array of size (Q,) representing [1 x (# activities)] vector of activity recommendation score values,
+        or QxN matrix if learner values are given for N learners
     """
     # transformations from raw inputs
     # calculate_relevance() uses 0.0 for relevance elements with corresponding NaN guess/slip values
     relevance = calculate_relevance(guess, slip)
-    if last_attempted_guess is None and last_attempted_slip is None:
-        last_attempted_relevance = None
-    else:
+    if last_attempted_relevance is None and not (last_attempted_guess is None and last_attempted_slip is None):
         last_attempted_relevance = calculate_relevance(last_attempted_guess, last_attempted_slip)
     L = np.log(odds(learner_mastery))
-    difficulty = fillna(difficulty, value=0.5)
-
-    # calculate activity subscores
-    P = recommendation_score_P(relevance, L, prereqs, r_star, L_star)
-    R = recommendation_score_R(relevance, L, L_star)
-    C = recommendation_score_C(relevance, last_attempted_relevance)
-    D = recommendation_score_D(relevance, L, difficulty)
-
-    subscores = np.array([P, R, C, D])
-
-    # log individual subscores for debugging
-    subscore_labels = ['P', 'R', 'C', 'D']
-    for subscore, label in zip(subscores, subscore_labels):
-        log.debug('[recommendation_score] Subscore {}: {}'.format(label, subscore))
 
-    # compute weighted average of subscores
-    weights = np.array([W_p, W_r, W_d, W_c])
-    scores = np.dot(weights, subscores)
+    # calculate activity subscores and their weighted average
+    # substrategies with zero weight are skipped, since they don't contribute to the scores
+    scores = np.zeros(relevance.shape[:1] + L.shape[:-1])
+    if W_p:
+        P = recommendation_score_P(relevance, L, prereqs, r_star, L_star)
+        log.debug('[recommendation_score] Subscore P: {}'.format(P))
+        scores += W_p*P
+    if W_r:
+        R = recommendation_score_R(relevance, L, L_star)
+        log.debug('[recommendation_score] Subscore R: {}'.format(R))
+        scores += W_r*R
+    if W_d:
+        D = recommendation_score_D(relevance, L, fillna(difficulty, value=0.5))
+        log.debug('[recommendation_score] Subscore D: {}'.format(D))
+        scores += W_d*D
+    if W_c and last_attempted_relevance is not None:
+        C = recommendation_score_C(relevance, last_attempted_relevance)
+        log.debug('[recommendation_score] Subscore C: {}'.format(C))
+        scores += W_c*C
     log.debug("[recommendation_score] Combined activity scores: {}".format(scores))
     return scores
 
@@ -414,35 +501,37 @@ def recommendation_score_P(relevance, L, prereqs, r_star, L_star):
     """
     Compute scores according to Substrategy P
     :param slip: QxK np.array, slip parameter values for activities
-    :param L: 1xK vector of learner mastery values
+    :param L: 1xK vector (or NxK matrix) of learner mastery values
     :param prereqs: QxQ np.array, prerequisite matrix
     :param r_star: float, Threshold for forgiving lower odds of mastering pre-requisite LOs.
     :param L_star: float, Threshold logarithmic odds. If mastery logarithmic odds are >= than L_star, the LO is
         considered mastered
     :return: np.array of size (Q,) representing [1 x (# activities)] vector of activity recommendation score values
+        (QxN matrix if L is a matrix)
     """
-    m_w = prereqs
     # replace missing values with 0.
-    fillna(m_w)
+    m_w = fillna(prereqs)
     # fillna(relevance)
 
-    m_r = np.dot(np.minimum(L - L_star, 0), m_w)
-    P = np.dot(relevance, np.minimum((m_r + r_star), 0))
-    return P
+    m_r = np.fmin(L - L_star, 0.0) @ m_w
+    m_r += r_star
+    # clamp in place, reusing the m_r buffer
+    return relevance @ np.fmin(m_r, 0.0, out=m_r).T
 
 
 def recommendation_score_R(relevance, L, L_star):
     """
     Computes a recommendation score for each activity according to substrategy R
     :param relevance: (# activities) x (# LOs) np.array of relevance values for activities
-    :param L: 1xK vector of learner mastery log odds values (L)
+    :param L: 1xK vector (or NxK matrix) of learner mastery log odds values (L)
     :param L_star: scalar parameter, representing threshold for mastery log odds
     :return: np.array of size (Q,) representing [1 x (# activities)] vector of activity recommendation score values
+        (QxN matrix if L is a matrix)
     """
     log.debug("relevance: {}".format(relevance))
     log.debug("L: {}".format(L))
     log.debug("max(L_star-L,0): {}".format(np.maximum((L_star - L), 0)))
-    return np.dot(relevance, np.maximum((L_star - L), 0))
+    return np.dot(relevance, np.maximum((L_star - L), 0).T)
 
 
 def recommendation_score_C(relevance, last_attempted_relevance=None):
@@ -450,18 +539,22 @@ def recommendation_score_C(relevance, last_attempted_relevance=None):
     Compute scores according to Substrategy C
     If there is no last attempted activity, returns vector of zeros.
     :param relevance: (# activities) x (# LOs) np.array of relevance values for activities
-    :param last_attempted_relevance: 1 x (# LOs) np.array vector of calculated relevance values for last attempted
-        activity. Can be unspecified if no prior score data for learner is available.
+    :param last_attempted_relevance: 1 x (# LOs) np.array vector (or NxK matrix) of calculated relevance values for
+        last attempted activity. Can be unspecified if no prior score data for learner is available.
     :return: np.array of size (Q,), representing [1 x (# activities)] vector of activity recommendation score values
+        (QxN matrix if last_attempted_relevance is a matrix)
     """
     # Q is number of activities
     Q = relevance.shape[0]
 
     # case where no prior score data
     if last_attempted_relevance is None:
-        return np.repeat(0.0, Q)
+        return np.zeros(Q)
+    # case where the last attempted activity isn't relevant to any LO
+    if not np.any(last_attempted_relevance):
+        return np.zeros((Q,) + np.shape(last_attempted_relevance)[:-1])
 
-    return np.sqrt(np.dot(relevance, last_attempted_relevance))
+    return np.sqrt(np.dot(relevance, np.transpose(last_attempted_relevance)))
 
 
 def recommendation_score_D(relevance, L, difficulty):
@@ -469,16 +562,15 @@ def recommendation_score_D(relevance, L, difficulty):
     Substrategy D
     :param relevance: (# activities) x (# LOs) np.array of relevance parameter values for activities
     :param slip: (# activities) x (# LOs) np.array of slip parameter values for activities
-    :param L: 1xK vector of learner mastery log odds values (L)
+    :param L: 1xK vector (or NxK matrix) of learner mastery log odds values (L)
     :param difficulty: 1xQ np.array, difficulty values for activities
     :return: np.array of size (Q,), representing [1 x (# activities)] vector of activity recommendation score values
+        (QxN matrix if L is a matrix)
     """
-    K = len(L)  # number of LOs
-    Q = len(difficulty)  # number of activities
-    d_temp = np.tile(difficulty, (K, 1))  # repeated row vectors
-    L_temp = np.tile(L, (Q, 1)).T  # repeated column vectors
+    # (N)xQxK array of distances between learner mastery log odds and activity difficulty log odds, by broadcasting
+    distance = np.abs(L[..., None, :] - np.log(odds(difficulty))[:, None])
 
-    return -np.diag(np.dot(relevance, np.abs(L_temp - np.log(odds(d_temp)))))
+    return -np.sum(relevance * distance, axis=-1).T
 
 
 def odds(p, epsilon=EPSILON):
@@ -490,8 +582,13 @@ def odds(p, epsilon=EPSILON):
     :return: odds value (float)
     """
     # regularize
-    p = np.minimum(np.maximum(p, epsilon), 1-epsilon)
-    return p/(1.0-p)
+    if np.isscalar(p):
+        # plain python arithmetic for scalars, to avoid numpy call overhead
+        p = min(max(p, epsilon), 1-epsilon)
+        return p/(1.0-p)
+    p = np.clip(p, epsilon, 1-epsilon)
+    p /= 1.0-p  # p is a new array after clipping, so it can be divided in place
+    return p
 
 
 def calculate_relevance_from_odds(guess_odds, slip_odds):
@@ -502,8 +599,9 @@ def calculate_relevance_from_odds(guess_odds, slip_odds):
         guess_odds (np.array)
         slip_odds (np.array)
     """
-    r = -np.log(guess_odds)-np.log(slip_odds)
-    return fillna(r, 0.0)
+    r = -np.log(guess_odds*slip_odds)
+    fillna(r, 0.0, inplace=True)
+    return r
 
 
 def calculate_relevance(guess, slip):
@@ -514,8 +612,10 @@ def calculate_relevance(guess, slip):
     :param slip: (np.array) slip probability values
     :return: (np.array) same size as inputs
     """
-    r = -np.log(odds(guess))-np.log(odds(slip))
-    return fillna(r, 0.0)
+    # one log of the product, rather than the sum of two logs
+    r = -np.log(odds(guess)*odds(slip))
+    fillna(r, 0.0, inplace=True)
+    return r
 
 
 def knowledge(scores, guess, slip):
@@ -532,46 +632,40 @@ def knowledge(scores, guess, slip):
     :param slip: full slip param matrix
     """
 
-    # list of matrix 0-based indices for activities associated with scores
-    activity_idxs = scores[:, 1].astype(int)
+    # list of matrix 0-based indices for activities associated with scores, and list of score values
+    return _knowledge(scores[:, 1].astype(int), scores[:, 2], -np.log(guess), -np.log(slip))
 
-    m_guess_u = -np.log(guess[activity_idxs, ])
-    m_slip_u = -np.log(slip[activity_idxs, ])
+
+def _knowledge(activity_idxs, correctness, m_guess, m_slip):
+    """
+    Empirical knowledge of a single learner (see knowledge()), from separate column arrays of score information
+    :param activity_idxs: 1-d int np.array of activity indices for scores, in chronological order
+    :param correctness: 1-d np.array of score values
+    :param m_guess: full matrix of -log(guess) values
+    :param m_slip: full matrix of -log(slip) values
+    """
+    m_guess_u = m_guess[activity_idxs]
+    m_slip_u = m_slip[activity_idxs]
 
     # number of knowledge components
-    n_los = guess.shape[1]
+    n_los = m_guess.shape[1]
 
     # number of scores
-    N = scores.shape[0]
-
-    # list of score values
-    correctness = scores[:, 2]
-
-    z = np.zeros((N+1, n_los))
-    x = np.repeat(0.0, N)
-    z[0, ] = np.dot((1.0 - correctness), m_slip_u)
-    z[N, ] = np.dot(correctness, m_guess_u)
-
-    if N > 1:
-        for n in range(1, N):
-            x[range(n)] = correctness[range(n)]
-            x[range(n, N)] = 1.0 - correctness[range(n, N)]
-            temp = np.vstack((m_guess_u[range(n), ], m_slip_u[n:, ]))
-            z[n, ] = np.dot(x, temp)
-
-    knowl = np.zeros((N, n_los))
-
-    for j in range(n_los):
-        ind = np.where(z[:, j] == min(z[:, j]))[0]
-        for i in ind:
-            temp = np.repeat(0.0, N)
-            if i == 0:
-                temp = np.repeat(1.0, N)
-            elif i < N:
-                temp[i:N] = 1.0
-            knowl[:, j] = knowl[:, j] + temp
-        # We average the knowledge when there are multiple candidates (length(ind)>1)
-        knowl[:, j] = knowl[:, j] / len(ind)
+    N = len(correctness)
+
+    # z[n] is the cost of the learner's knowledge switching from 0 to 1 at score n:
+    # guess terms for scores before n, plus slip terms for scores from n onwards,
+    # built from prefix and suffix sums rather than recomputing the full sum for each n
+    z = np.empty((N+1, n_los))
+    z[0] = 0.0
+    np.cumsum(correctness[:, None] * m_guess_u, axis=0, out=z[1:])
+    z[:-1] += np.cumsum(((1.0 - correctness)[:, None] * m_slip_u)[::-1], axis=0)[::-1]
+
+    # candidate switch points (rows of z at the minimum) for each LO; knowledge is 1.0 from a candidate onwards
+    is_min = np.isclose(z, z.min(axis=0), rtol=1e-12, atol=1e-12)
+    # for each score, count the candidates at or before it, and average over candidates
+    # (we average the knowledge when there are multiple candidates)
+    knowl = np.cumsum(is_min, axis=0)[:N] / is_min.sum(axis=0)
 
     return knowl
 
@@ -615,88 +709,74 @@ def estimate(score_records, current_guess, current_slip, current_transit, master
     guess_denom = trans.copy()
     slip = trans.copy()
     slip_denom = trans.copy()
-    p_i = np.repeat(0., n_los)
+    p_i = np.zeros(n_los)
     p_i_denom = p_i.copy()
 
     # full QxK relevance matrix
     m_k = calculate_relevance(guess, slip)
 
-    score_learner = score_records[:, 0]
-    score_activity = score_records[:, 1]
-    # score_value = score_records[:, 2]
-
-    # list of unique learner ids to iterate through
-    learners = np.unique(score_learner)
-
-    for learner in learners:
-        # subset of score_records table for a particular learner
-        user_score_records = score_records[score_activity == learner]
-
-        # user_scores is a list of scores for a particular user u, arranged in chronological order.
-        user_scores = user_score_records[:, 2]
-
-        # if no data for learner, go to next learner
-        if len(user_scores) == 0:
-            continue
-
-        # get activity matrix 0-based index values for each activity in user scores
-        activity_idxs = user_score_records[:, 1].astype(int)
-
-        # relevance values for each activity attempted by user
-        m_k_u = m_k[activity_idxs, ]
-
-        # Calculate the sum of relevances of user's experience for each learning objective
-        u_R = np.sum(m_k_u, axis=0)
-
+    # group score records by learner with a single stable sort, so that each learner's records are a contiguous
+    # slice of the sorted table, still in chronological order
+    score_records = score_records[np.argsort(score_records[:, 0], kind='stable')]
+    # contiguous column arrays (learner, activity index, score value), converted once for all learners
+    score_learner = np.ascontiguousarray(score_records[:, 0])
+    score_activity_idxs = score_records[:, 1].astype(int)
+    score_values = np.ascontiguousarray(score_records[:, 2])
+    # start and end row of each learner's records
+    starts = np.flatnonzero(np.r_[True, score_learner[1:] != score_learner[:-1]])
+    ends = np.r_[starts[1:], len(score_records)]
+
+    # -log(guess) and -log(slip) terms used for empirical knowledge, computed once for all learners
+    m_guess = -np.log(current_guess)
+    m_slip = -np.log(current_slip)
+
+    # empirical knowledge for every score record; only this part is computed learner by learner
+    u_knowledge = np.empty((len(score_records), n_los))
+    for start, end in zip(starts, ends):
+        u_knowledge[start:end] = _knowledge(score_activity_idxs[start:end], score_values[start:end], m_guess, m_slip)
+
+    if len(score_records):
+        # relevance values for each activity attempted, for all score records
+        m_k_u = m_k[score_activity_idxs]
+
+        # Calculate the sum of relevances of each user's experience for each learning objective
         # Implement the relevance threshold: zero-out what is not above it, set the rest to 1
-        u_R = (u_R > relevance_threshold)
+        u_R = np.add.reduceat(m_k_u, starts, axis=0) > relevance_threshold
         m_k_u = (m_k_u > relevance_threshold)
 
-        # calculate knowledge based on user scores
-        u_knowledge = knowledge(user_score_records, current_guess, current_slip)
-
-        # Contribute to the averaged initial knowledge.
-        p_i += u_knowledge[0, ] * u_R
-        p_i_denom += u_R
+        # Contribute to the averaged initial knowledge (knowledge at each user's first score).
+        p_i += np.sum(u_knowledge[starts] * u_R, axis=0)
+        p_i_denom += np.sum(u_R, axis=0)
 
         # Contribute to the trans, guess and slip probabilities
         # (numerators and denominators separately).
-
-        J = len(user_scores)
-
-        # j is index within user_scores, score is score object
-        for j, score in enumerate(user_scores):
-            # q is matrix index for activity associated with score
-            q = activity_idxs[j]
-
-            shorthand = m_k_u[j, ] * (1.0 - u_knowledge[j,])
-            guess[q, ] += shorthand * user_scores[j]
-            guess_denom[q, ] += shorthand
-
-            shorthand = m_k_u[j, ] - shorthand  # equals m_k_u * u_knowledge
-            slip[q, ] += shorthand * (1.0 - user_scores[j])
-            slip_denom[q, ] += shorthand
-
-            if j < (J - 1):
-                shorthand = m_k_u[j, ] * (1.0 - u_knowledge[j, ])
-                trans[q, ] += shorthand * u_knowledge[j + 1, ]
-                trans_denom[q, ] += shorthand
-
-    # Normalize the results over users.
-    ind = np.where(p_i_denom != 0)
-    p_i[ind] /= p_i_denom[ind]
-    ind = np.where(trans_denom != 0)
-    trans[ind] /= trans_denom[ind]
-    ind = np.where(guess_denom != 0)
-    guess[ind] /= guess_denom[ind]
-    ind = np.where(slip_denom != 0)
-    slip[ind] /= slip_denom[ind]
-
-    # Replace with nans where denominators are below information cutoff
-    p_i[(p_i_denom < information_threshold) | (p_i_denom == 0)] = np.nan
-    trans[(trans_denom < information_threshold) | (trans_denom == 0)] = np.nan
-    guess[(guess_denom < information_threshold) | (guess_denom == 0)] = np.nan
-    slip[(slip_denom < information_threshold) | (slip_denom == 0)] = np.nan
+        # Rows are accumulated into the activity (q) rows of each matrix with np.add.at,
+        # which adds repeated activities once per score, in score order, for all users at once
+
+        # relevant LOs not yet known / known at the time of each score
+        not_known = m_k_u * (1.0 - u_knowledge)
+        known = m_k_u - not_known  # equals m_k_u * u_knowledge
+
+        np.add.at(guess, score_activity_idxs, not_known * score_values[:, None])
+        np.add.at(guess_denom, score_activity_idxs, not_known)
+
+        np.add.at(slip, score_activity_idxs, known * (1.0 - score_values[:, None]))
+        np.add.at(slip_denom, score_activity_idxs, known)
+
+        # transitions from each score to the next score of the same user (no transition after a user's last score)
+        has_next = np.ones(len(score_records), dtype=bool)
+        has_next[ends - 1] = False
+        has_next = has_next[:-1]
+        trans_idxs = score_activity_idxs[:-1][has_next]
+        np.add.at(trans, trans_idxs, not_known[:-1][has_next] * u_knowledge[1:][has_next])
+        np.add.at(trans_denom, trans_idxs, not_known[:-1][has_next])
+
+    for numerator, denominator in [(p_i, p_i_denom), (trans, trans_denom), (guess, guess_denom), (slip, slip_denom)]:
+        # Normalize the results over users (in place, skipping zero denominators)
+        is_zero = denominator == 0
+        np.divide(numerator, denominator, out=numerator, where=~is_zero)
+        # Replace with nans where denominators are below information cutoff
+        numerator[(denominator < information_threshold) | is_zero] = np.nan
 
     # Remove guess and slip probabilities of 0.5 and above (degeneracy):
     if remove_degeneracy:
@@ -731,13 +811,14 @@ def estimate(score_records, current_guess, current_slip, current_transit, master
     fillna(guess, m_guess, inplace=True)
     fillna(slip, m_slip, inplace=True)
 
+    # all of these are new arrays (not views of the inputs), so they are returned without copying
     return {
-        'L_i': 1.0*L,
-        'trans': 1.0*trans,
-        'guess': 1.0*guess,
-        'slip': 1.0*slip,
-        'L_i_nan': 1.0*L_i_nan,
-        'trans_nan': 1.0*trans_nan,
-        'guess_nan': 1.0*guess_nan,
-        'slip_nan': 1.0*slip_nan
+        'L_i': L,
+        'trans': trans,
+        'guess': guess,
+        'slip': slip,
+        'L_i_nan': L_i_nan,
+        'trans_nan': trans_nan,
+        'guess_nan': guess_nan,
+        'slip_nan': slip_nan
     }
\ No newline at end of file
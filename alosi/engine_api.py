@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor
 from alosi.api_client import ApiClient
 
 
@@ -7,35 +8,36 @@ class EngineApi(ApiClient):
     """
     api_path = "/api/v2"
 
-    def __init__(self, host="http://localhost:8000", token=None):
-        super().__init__(host, token)
+    def __init__(self, host="http://localhost:8000", token=None, rate_limit=None):
+        super().__init__(host, token, rate_limit=rate_limit)
 
     def create_activity(self, **kwargs):
-        return self.client.post(
-            self._absolute_url('activity'),
-            json=kwargs
-        )
+        return self.request('POST', 'activity', json=kwargs)
 
     def recommend(self, learner=None, collection=None, sequence=None):
-        return self.client.post(
-            self._absolute_url('activity/recommend'),
-            json=dict(learner=learner, collection=collection, sequence=sequence)
+        return self.request(
+            'POST', 'activity/recommend',
+            json={'learner': learner, 'collection': collection, 'sequence': sequence}
         )
 
     def submit_score(self, learner=None, activity=None, score=None):
-        return self.client.post(
-            self._absolute_url('score'),
-            json=dict(learner=learner, activity=activity, score=score)
+        return self.request(
+            'POST', 'score',
+            json={'learner': learner, 'activity': activity, 'score': score}
         )
 
+    def submit_scores(self, scores, max_workers=8):
+        """
+        Submit many scores concurrently, over the client's pooled keep-alive connections
+        :param scores: iterable of dicts with keys learner, activity, score
+        :param max_workers: maximum number of concurrent requests
+        :return: list of responses, in the same order as scores
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda score: self.submit_score(**score), scores))
+
     def bulk_update_mastery(self, data):
-        return self.client.put(
-            self._absolute_url('mastery/bulk_update'),
-            json=data
-        )
+        return self.request('PUT', 'mastery/bulk_update', json=data)
 
     def create_knowledge_component(self, **kwargs):
-        return self.client.post(
-            self._absolute_url('knowledge_component'),
-            json=kwargs
-        )
+        return self.request('POST', 'knowledge_component', json=kwargs)
@@ -1,14 +1,20 @@
 from google.oauth2 import service_account
 from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import AuthorizedSession
-from pandas import read_csv
-from io import StringIO
-import gspread
+from google.auth.transport.requests import AuthorizedSession, Request
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from urllib.parse import quote
+from pandas import DataFrame, read_pickle
+from pandas.io.parsers import TextParser
 import os
+import tempfile
 
 # default scope allows full access to google drive
 SCOPES = ['https://www.googleapis.com/auth/drive']
 
+SHEETS_API_URL = 'https://sheets.googleapis.com/v4/spreadsheets'
+DRIVE_API_URL = 'https://www.googleapis.com/drive/v3/files'
+
 
 def get_oauth2_credentials(client_secrets_file, port=5555, scopes=SCOPES):
 
@@ -47,42 +53,234 @@ def get_service_account_credentials(credential_file=None, scopes=SCOPES):
     return service_account.Credentials.from_service_account_file(credential_file, scopes=scopes)
 
 
-def export_sheet_to_dataframe(file_id, credentials, worksheet_title=None, encoding='utf-8'):
+def export_sheet_to_dataframe(file_id, credentials, worksheet_title=None, encoding=None, cache_dir=None,
+                              dtype_backend=None):
     """
-    Get google sheet as pandas dataframe, using authenticated request to
-    https://docs.google.com/spreadsheets/d/{id}/export?format=csv&id={id}&gid={gid}
-    Expects worksheet data to be reasonably table-like
+    Get google sheet as pandas dataframe, from the worksheet cell values (as displayed) fetched with the Sheets API
+    Expects worksheet data to be reasonably table-like, with column names in the first row
 
     :param file_id: drive file id
     :param credentials: google-auth credentials object
     :param worksheet_title: (str) title of spreadsheet, defaults to getting first spreadsheet if not specified
-    :param encoding: character encoding system, e.g. 'utf-8'
+    :param encoding: unused (values are fetched as json rather than as a csv export), kept for backwards compatibility
+    :param cache_dir: (str) optional directory to cache dataframes in; if specified, the sheet is only downloaded
+        again if the drive file version has changed since it was cached
+    :param dtype_backend: optional pandas dtype backend to convert columns to, e.g. 'pyarrow' (requires pyarrow)
+        or 'numpy_nullable'; by default string columns are left as python objects
     :return: (pd.DataFrame) worksheet data as pandas DataFrame
     """
-    worksheet_id = _get_worksheet_id(file_id, credentials, worksheet_title=worksheet_title)
-    url = "https://docs.google.com/spreadsheets/d/{id}/export?format=csv&id={id}&gid={gid}".format(
-        id=file_id, gid=worksheet_id
-    )
-    response = AuthorizedSession(credentials).get(url)
-    response.encoding = encoding
-    df = read_csv(StringIO(response.text))
+    df = _get_sheet_dataframe(file_id, credentials, worksheet_title, cache_dir)
+    if dtype_backend:
+        df = df.convert_dtypes(dtype_backend=dtype_backend)
     return df
 
 
-def _get_worksheet_id(file_id, credentials=None, worksheet_title=None):
+def _get_sheet_dataframe(file_id, credentials, worksheet_title=None, cache_dir=None):
+    """
+    Get google sheet worksheet as pandas dataframe, from cache_dir if specified and up to date
+
+    :param file_id: drive file id
+    :param credentials: google-auth credentials object
+    :param worksheet_title: (str) title of spreadsheet, defaults to getting first spreadsheet if not specified
+    :param cache_dir: (str) optional directory to cache dataframes in
+    :return: (pd.DataFrame) worksheet data as pandas DataFrame
+    """
+    if not cache_dir:
+        return _export_sheet_to_dataframe(file_id, credentials, worksheet_title)
+
+    # cache file is keyed by file id, worksheet title and file version, so any edit to the sheet invalidates it
+    cache_file = os.path.join(cache_dir, '{}-{}-{}.pkl'.format(
+        file_id, quote(worksheet_title or '', safe=''), _get_file_version(file_id, credentials)
+    ))
+    if os.path.exists(cache_file):
+        return read_pickle(cache_file)
+    df = _export_sheet_to_dataframe(file_id, credentials, worksheet_title)
+    os.makedirs(cache_dir, exist_ok=True)
+    # write to a temporary file and move it into place, so that an interrupted or concurrent write
+    # never leaves a truncated cache file behind
+    fd, tmp_file = tempfile.mkstemp(dir=cache_dir, prefix='.', suffix='.pkl.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            df.to_pickle(f)
+        os.replace(tmp_file, cache_file)
+    except BaseException:
+        os.remove(tmp_file)
+        raise
+    return df
+
+
+def _export_sheet_to_dataframe(file_id, credentials, worksheet_title=None):
+    """
+    Download google sheet worksheet values as pandas dataframe (see export_sheet_to_dataframe)
+
+    :param file_id: drive file id
+    :param credentials: google-auth credentials object
+    :param worksheet_title: (str) title of spreadsheet, defaults to getting first spreadsheet if not specified
+    :return: (pd.DataFrame) worksheet data as pandas DataFrame
+    """
+    if not worksheet_title:
+        worksheet_title = _get_worksheet_properties(file_id, credentials)[0]['title']
+    url = '{}/{}/values/{}'.format(SHEETS_API_URL, file_id, quote(_worksheet_range(worksheet_title), safe=''))
+    response = _get_session(credentials).get(url)
+    response.raise_for_status()
+    return _values_to_dataframe(response.json().get('values', []))
+
+
+def export_sheets_to_dataframes(sheets, credentials, max_workers=5, cache_dir=None, dtype_backend=None):
+    """
+    Get several google sheets as pandas dataframes
+    Worksheets from the same file are fetched together with a single values:batchGet request, and different files
+    are fetched concurrently; the number of concurrent requests is bounded by max_workers, to stay within Sheets API
+    rate limits
+
+    :param sheets: list of (file_id, worksheet_title) tuples; worksheet_title can be None to get the first worksheet
+    :param credentials: google-auth credentials object
+    :param max_workers: maximum number of files (or sheets, if cache_dir is specified) to fetch at the same time
+    :param cache_dir: (str) optional directory to cache dataframes in (see export_sheet_to_dataframe())
+    :param dtype_backend: optional pandas dtype backend to convert columns to (see export_sheet_to_dataframe())
+    :return: (list of pd.DataFrame) worksheet data, in the same order as sheets
+    """
+    # refresh the access token up front, rather than having the first requests of each worker refresh it
+    _ensure_fresh(credentials)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        if cache_dir:
+            # cached sheets are fetched (or not) individually, depending on the cache state of each file
+            return list(executor.map(
+                lambda sheet: export_sheet_to_dataframe(
+                    sheet[0], credentials, worksheet_title=sheet[1], cache_dir=cache_dir, dtype_backend=dtype_backend
+                ),
+                sheets
+            ))
+
+        # worksheet titles to fetch for each file
+        worksheet_titles = {}
+        for file_id, worksheet_title in sheets:
+            worksheet_titles.setdefault(file_id, {})[worksheet_title] = None
+        file_dfs = dict(zip(worksheet_titles, executor.map(
+            lambda file_id: _export_sheets_from_file(file_id, credentials, list(worksheet_titles[file_id])),
+            worksheet_titles
+        )))
+
+    dfs = [file_dfs[file_id][worksheet_title] for file_id, worksheet_title in sheets]
+    if dtype_backend:
+        dfs = [df.convert_dtypes(dtype_backend=dtype_backend) for df in dfs]
+    return dfs
+
+
+def _export_sheets_from_file(file_id, credentials, worksheet_titles):
+    """
+    Download values of several worksheets in the same google sheet as pandas dataframes, with a single request
+
+    :param file_id: drive file id
+    :param credentials: google-auth credentials object
+    :param worksheet_titles: list of worksheet titles; None can be used for the first worksheet
+    :return: (dict) mapping from worksheet title (as passed in) to pd.DataFrame
+    """
+    first_title = None
+    if None in worksheet_titles or '' in worksheet_titles:
+        first_title = _get_worksheet_properties(file_id, credentials)[0]['title']
+    ranges = [_worksheet_range(worksheet_title or first_title) for worksheet_title in worksheet_titles]
+    response = _get_session(credentials).get(
+        '{}/{}/values:batchGet'.format(SHEETS_API_URL, file_id), params={'ranges': ranges}
+    )
+    response.raise_for_status()
+    # value ranges are returned in the same order as the requested ranges
+    return {
+        worksheet_title: _values_to_dataframe(value_range.get('values', []))
+        for worksheet_title, value_range in zip(worksheet_titles, response.json()['valueRanges'])
+    }
+
+
+def _worksheet_range(worksheet_title):
+    """
+    A1 notation range covering a whole worksheet
+
+    :param worksheet_title: (str) worksheet title
+    :return: (str) range
+    """
+    return "'{}'".format(worksheet_title.replace("'", "''"))
+
+
+def _values_to_dataframe(values):
+    """
+    Build dataframe from a list of rows of cell values, with column names in the first row
+    Values are parsed in memory, with the same type inference and missing value handling as read_csv
+
+    :param values: list of lists of cell values (str); rows may omit trailing empty cells
+    :return: (pd.DataFrame)
     """
-    Retrieve Google Sheet worksheet id from worksheet title
+    if not values:
+        return DataFrame()
+    # pad rows (including the header) to the same width, since the values api omits trailing empty cells,
+    # and name blank header cells like read_csv does for the csv export
+    width = max(len(row) for row in values)
+    header = [value or 'Unnamed: {}'.format(i) for i, value in enumerate(values[0] + [''] * (width - len(values[0])))]
+    rows = [row + [''] * (width - len(row)) for row in values[1:]]
+    return TextParser([header] + rows, header=0).read()
+
+
+def clear_cache():
+    """
+    Clear cached worksheet metadata (e.g. after worksheets are added, renamed or reordered)
+    """
+    _get_worksheet_properties.cache_clear()
+
+
+def _ensure_fresh(credentials):
+    """
+    Refresh credentials access token if it is missing or expired
+
+    :param credentials: google-auth credentials object
+    """
+    if not credentials.valid:
+        credentials.refresh(Request())
+
+
+@lru_cache(maxsize=8)
+def _get_session(credentials):
+    """
+    Get authorized requests session for credentials
+    Cached per credentials object, so that connections (and the access token) are reused across requests
+
+    :param credentials: google-auth credentials object
+    :return: (google.auth.transport.requests.AuthorizedSession)
+    """
+    session = AuthorizedSession(credentials)
+    # Google APIs only gzip responses if the user agent also contains "gzip"; requests decompresses transparently
+    session.headers.update({
+        'Accept-Encoding': 'gzip',
+        'User-Agent': '{} (gzip)'.format(session.headers.get('User-Agent', 'alosi')),
+    })
+    return session
+
+
+@lru_cache(maxsize=128)
+def _get_worksheet_properties(file_id, credentials):
+    """
+    Retrieve properties of all worksheets in a Google Sheet with a single Sheets API request
+    Cached, so exporting several worksheets from the same file only fetches the metadata once
+
+    :param file_id: drive file id
+    :param credentials: google-auth credentials object
+    :return: (list of dict) worksheet properties (sheetId, title, index), ordered by index
+    """
+    response = _get_session(credentials).get(
+        '{}/{}'.format(SHEETS_API_URL, file_id), params={'fields': 'sheets.properties(sheetId,title,index)'}
+    )
+    response.raise_for_status()
+    properties = [sheet['properties'] for sheet in response.json()['sheets']]
+    return sorted(properties, key=lambda worksheet: worksheet.get('index', 0))
+
+
+def _get_file_version(file_id, credentials):
+    """
+    Retrieve the version of a drive file, which increases with every change to the file
 
     :param file_id: drive file id
     :param credentials: google-auth credentials object
-    :param worksheet_title: (str) title of spreadsheet, defaults to returning id of first spreadsheet if not specified
-    :return: spreadsheet id
-    """
-    gc = gspread.Client(auth=credentials)
-    gc.session = AuthorizedSession(credentials)
-    sheet = gc.open_by_key(file_id)
-    if worksheet_title:
-        worksheet = sheet.worksheet(worksheet_title)
-    else:
-        worksheet = sheet.get_worksheet(0)
-    return worksheet.id
+    :return: (str) file version
+    """
+    response = _get_session(credentials).get('{}/{}'.format(DRIVE_API_URL, file_id), params={'fields': 'version'})
+    response.raise_for_status()
+    return response.json()['version']
+
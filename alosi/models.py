@@ -2,7 +2,9 @@ import json
 from abc import ABC, abstractmethod
 from cached_property import cached_property
 from .api_client import ApiError
+import threading
 import urllib
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
 
 """
@@ -20,6 +22,60 @@ possible useful attributes
 
 """
 
+# number of threads that map_concurrently calls made from the current (worker) thread may use,
+# so that nested calls share the outermost max_workers rather than multiplying it
+_worker_budget = threading.local()
+
+
+def map_concurrently(func, items, max_workers):
+    """
+    Apply func to each item using a thread pool, e.g. to overlap independent HTTP requests
+    Exceptions raised in worker threads are re-raised in the calling thread
+    When called from inside another map_concurrently call, the threads of the outer call are split between the nested
+    calls (running them serially once there is only one thread to spare), so that the total number of concurrent
+    workers never exceeds the outermost max_workers
+
+    :param func: callable taking a single item
+    :param items: items to apply func to
+    :param max_workers: maximum number of threads to use
+    :return: list of results, in the same order as items
+    """
+    items = list(items)
+    available = min(max_workers, getattr(_worker_budget, 'value', max_workers))
+    workers = min(available, len(items))
+    if workers <= 1:
+        return [func(item) for item in items]
+    budget = available // workers
+
+    def run(item):
+        # pool threads are reused, so the budget is set for the duration of each call only
+        _worker_budget.value = budget
+        try:
+            return func(item)
+        finally:
+            del _worker_budget.value
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run, items))
+
+
+def is_unchanged(existing_data, new_data):
+    """
+    Check whether updating existing_data with the fields in new_data would be a no-op
+    Equivalent to {**existing_data, **new_data} == existing_data, but short-circuits on the first differing field
+    instead of building a merged copy of existing_data
+
+    :param existing_data: remote object data
+    :type existing_data: dict
+    :param new_data: field values to be set, e.g. output of to_api_params()
+    :type new_data: dict
+    :rtype: bool
+    """
+    return all(
+        field in existing_data and existing_data[field] == value for field, value in new_data.items()
+    )
+
+
 def requires_remote_state(func):
     """
     Decorates a function that requires existing remote object to function (e.g. update, get)
@@ -100,8 +156,8 @@ class ApiModel(ABC):
         # update
         new_data = self.to_api_params()
         # only send request if a change is being made
-        if not {**self.data, **new_data} == self.data:
-            response = self.api.request('PUT', f'{self.model_name}/{self.data[self.lookup_field]}', json=self.to_api_params())
+        if not is_unchanged(self.data, new_data):
+            response = self.api.request('PUT', f'{self.model_name}/{self.data[self.lookup_field]}', json=new_data)
             if not response.ok:
                 raise ApiError(response, message=f'Update error: {self}')
             self.__dict__['data'] = response.json()  # manually update cache
@@ -112,7 +168,7 @@ class ApiModel(ABC):
         
         """
         if not self.id:
-            return Exception('Primary key not found - cannot delete')
+            raise Exception('Primary key not found - cannot delete')
         response = self.api.request('DELETE', f'{self.model_name}/{self.data[self.lookup_field]}')
         if not response.ok:
             raise ApiError(response, message=f'Error updating bridge {self.model_name}')
@@ -168,23 +224,30 @@ class BridgeCollection(BridgeApiModelMixin, ApiModel):
         existing_activities = {x['source_launch_url']: x for x in response.json()}
 
         # create new activities
+        activities_to_update = []
         for activity in activity_set:
+            # populate activity data cache from the activity list results, to avoid an individual GET per activity
+            # (the list is filtered by collection, as is BridgeActivity.data, so a missing url means no remote object)
+            activity.__dict__['data'] = existing_activities.get(activity.model.url)
             if activity.model.url in existing_activities:
                 existing_data = existing_activities[activity.model.url]
                 # compare field values only for field set in to_bridge_params()
-                if {**existing_data, **activity.to_api_params()} == existing_data:
+                if is_unchanged(existing_data, activity.to_api_params()):
                     continue
-            activity.update()
+            activities_to_update.append(activity)
+        map_concurrently(lambda activity: activity.update(), activities_to_update, self.client.max_workers)
 
         # # remove old activities from set
-        new_ids = set(x.model.url for x in activity_set)
-        for existing_id, existing_activity in existing_activities.items():
-            if existing_id not in new_ids:
-                # activity model in bridge context is limited to within single collection, so delete method is appropriate here
-                # TODO not correct
-                # existing_activity.delete()
-                activity_pk = existing_activity['id']
-                self.api.request('DELETE', f'activity/{activity_pk}')
+        # activity model in bridge context is limited to within single collection, so delete method is appropriate here
+        # TODO not correct
+        # existing_activity.delete()
+        def delete_activity(url):
+            r = self.api.request('DELETE', f'activity/{existing_activities[url]["id"]}')
+            if not r.ok:
+                raise ApiError(r, message='Error removing activity from collection')
+
+        stale_urls = existing_activities.keys() - set(x.model.url for x in activity_set)
+        map_concurrently(delete_activity, stale_urls, self.client.max_workers)
 
     @requires_remote_state
     def bridge_engine_sync(self):
@@ -223,22 +286,11 @@ class EngineCollection(EngineApiModelMixin, ApiModel):
             return None
 
     def paginate(self, response):
-        """Fetch all results from paginated list api view
-        TODO probably move to api client
+        """Iterate through all results from paginated list api view (see ApiClient.paginate())
         :param response: response from first page
         :type response: reqeusts Response
         """
-        if not response.ok:
-            raise ApiError(response)
-        page = response.json()
-        if 'results' not in page:
-            raise Exception('Paginator: "results" key not found in page')
-        results = page['results']
-        while page['next']:
-            page = self.api.client.get(page['next']).json()
-            results.extend(page['results'])
-        return results
-        
+        return self.api.paginate(response)
 
     def update_activity_set(self, activity_set):
         """
@@ -246,9 +298,9 @@ class EngineCollection(EngineApiModelMixin, ApiModel):
         Activities existing previously in collection activity set but not part of new activity set
         will be removed from the collection activity set
 
-        TODO potential optimization: populating Activity cache from collection activity list endpoint results,
+        Activity data cache is populated from collection activity list endpoint results,
         to reduce need for individual GET requests for each activity when fetching state
-        
+
         :param activity_set: activities to assign to collection
         :type activity_set: list EngineActivity
         """
@@ -263,32 +315,45 @@ class EngineCollection(EngineApiModelMixin, ApiModel):
         existing_activities_data = {x['source_launch_url']: x for x in self.paginate(response)}
 
         # create new activities
+        activities_to_update = []
         for activity in activity_set:
             if activity.model.url in existing_activities_data:
                 existing_activity_data = existing_activities_data[activity.model.url]
+                # populate activity data cache from the activity list results, to avoid an individual GET per activity
+                # (activities not in this collection may still exist in engine, so those are left to EngineActivity.data)
+                activity.__dict__['data'] = existing_activity_data
                 # compare field values only for field set in to_bridge_params()
-                if {**existing_activity_data, **activity.to_api_params()} == existing_activity_data:
+                if is_unchanged(existing_activity_data, activity.to_api_params()):
                     continue
-            activity.update()
+            activities_to_update.append(activity)
+
+        # related KC's are expected to exist already (AlosiClient.push creates them up front); if any are missing,
+        # update activities one at a time, so that concurrent activity updates don't race to create shared KC's
+        kcs_exist = all(
+            kc.engine.id for activity in activities_to_update for kc in activity.model.knowledge_components
+        )
+        max_workers = self.client.max_workers if kcs_exist else 1
+        map_concurrently(lambda activity: activity.update(), activities_to_update, max_workers)
 
         # # delete old activities
-        new_ids = set(x.model.url for x in activity_set)
-        for url, existing_activity_data in existing_activities_data.items():
-            if url not in new_ids:
-                # get pk of membership relation
-                r = self.api.request('GET','collection_activity', params=dict(
-                        collection=self.data['id'],
-                        activity=existing_activity_data['id']
-                    )
+        def remove_activity(url):
+            # get pk of membership relation
+            r = self.api.request('GET','collection_activity', params=dict(
+                    collection=self.data['id'],
+                    activity=existing_activities_data[url]['id']
                 )
-                if not r.ok:
-                    raise ApiError(response, message='Error identifying collection-activity membership')
-                pk = r.json()['results'][0]['id']
-                
-                # delete membership relation
-                r = self.api.request('DELETE',f'collection_activity/{pk}')
-                if not r.ok:
-                    raise ApiError(response, message='Error removing activity from collection')
+            )
+            if not r.ok:
+                raise ApiError(r, message='Error identifying collection-activity membership')
+            pk = r.json()['results'][0]['id']
+
+            # delete membership relation
+            r = self.api.request('DELETE',f'collection_activity/{pk}')
+            if not r.ok:
+                raise ApiError(r, message='Error removing activity from collection')
+
+        stale_urls = existing_activities_data.keys() - set(x.model.url for x in activity_set)
+        map_concurrently(remove_activity, stale_urls, self.client.max_workers)
                 
 
     # def add_activity(activity):
@@ -366,7 +431,7 @@ class EngineActivity(EngineApiModelMixin, ApiModel):
         # Modify base method to ensure related collection exists and is updated before attempting activity update
         """
         if not self.model.collection.engine.id:
-            self.model.collection.create()
+            self.model.collection.engine.update()
         for kc in self.model.knowledge_components:
             if not kc.engine.id:
                 kc.engine.update()
@@ -377,7 +442,7 @@ class EngineActivity(EngineApiModelMixin, ApiModel):
         Override to ensure related models exist
         """
         if not self.model.collection.engine.id:
-            self.model.collection.create()
+            self.model.collection.engine.update()
         for kc in self.model.knowledge_components:
             if not kc.engine.id:
                 kc.engine.update()
@@ -534,6 +599,7 @@ class Collection:
             slug
             name
         """
+        self.client = client
         self.engine = EngineCollection(client, self) if 'engine' in client.enabled else None
         self.bridge = BridgeCollection(client, self) if 'bridge' in client.enabled else None
 
@@ -541,17 +607,25 @@ class Collection:
         self.name = name
 
     def push(self, activity_set=None):
-        if self.engine:
+        def push_engine():
             self.engine.update()
-        if self.bridge:
-            self.bridge.update()
-        # also push activity set if one is provided, otherwise just update collection metadata
-        if activity_set is not None:
-            if self.engine:
+            # also push activity set if one is provided, otherwise just update collection metadata
+            if activity_set is not None:
                 self.engine.update_activity_set([a.engine for a in activity_set])
-            if self.bridge:
+
+        def push_bridge():
+            self.bridge.update()
+            if activity_set is not None:
                 self.bridge.update_activity_set([a.bridge for a in activity_set])
 
+        # engine and bridge objects don't reference each other, so push to both systems concurrently
+        pushes = []
+        if self.engine:
+            pushes.append(push_engine)
+        if self.bridge:
+            pushes.append(push_bridge)
+        map_concurrently(lambda push: push(), pushes, self.client.max_workers)
+
 
 class KnowledgeComponent:
     """
@@ -1,41 +1,178 @@
+import gzip
+import logging
 import os
 import tarfile
 import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from types import FunctionType
+from xml.sax.saxutils import escape, quoteattr
 import tempfile
+import threading
+from io import BytesIO
+from pathlib import Path
 from lxml import etree
 from .google_drive import export_sheet_to_dataframe
+import numpy as np
 from pandas import Categorical
 import pandas as pd
 
 
-etree_write_default_params = dict(encoding="utf-8", pretty_print=True)
+log = logging.getLogger(__name__)
+
+# course exports are machine-consumed, so xml is not pretty printed by default (smaller files, faster serialization)
+etree_write_default_params = dict(encoding="utf-8", pretty_print=False)
+
+
+# parsers are reused across components, but an lxml parser can't be used by multiple threads at once,
+# so one is kept per thread
+_parsers = threading.local()
+
+
+def get_default_parser():
+    """
+    Get the xml parser for course structure xml (course.xml, chapter/sequential/vertical nodes) in the current thread
+    Blank text is removed so that output can be pretty printed, and xml:id's are not collected (not used in olx)
+    Use get_content_parser() for component content, where whitespace is significant
+    :rtype: etree.XMLParser
+    """
+    try:
+        return _parsers.default
+    except AttributeError:
+        _parsers.default = etree.XMLParser(remove_blank_text=True, collect_ids=False)
+        return _parsers.default
+
+
+def get_content_parser():
+    """
+    Get the xml parser for component content in the current thread
+    Blank text is kept, since whitespace between inline elements is significant in mixed content
+    (e.g. "<b>a</b> <i>b</i>"), and xml:id's are not collected (not used in olx)
+    :rtype: etree.XMLParser
+    """
+    try:
+        return _parsers.content
+    except AttributeError:
+        _parsers.content = etree.XMLParser(collect_ids=False)
+        return _parsers.content
+
+
+def xml_to_bytes(element_tree, **write_params):
+    """
+    Serialize etree.ElementTree with default formatting
+    :param element_tree: etree.ElementTree object
+    :param write_params: keyword args to pass to etree.tostring()
+    :rtype: bytes
+    """
+    default_write_params = {**etree_write_default_params, **write_params}
+    return etree.tostring(element_tree, **default_write_params)
 
 
 def write_xml_to_file(element_tree, target_path, **write_params):
     """
     Write etree.ElementTree to file by relative location within course export directory with default formatting
+    The tree is serialized in memory first, so that the file is written with a single write call
     :param element_tree: etree.ElementTree object
-    :param relative_path: relative location within course export directory (after tmpdir/course/...)
+    :param target_path: location to write file to
+    :param write_params: keyword args to pass to etree.tostring()
     """
-    default_write_params = {'encoding':'utf-8', 'pretty_print':True, **write_params}
-    element_tree.write(target_path, **default_write_params)
+    data = xml_to_bytes(element_tree, **write_params)
+    with open(target_path, 'wb') as f:
+        f.write(data)
+
+
+def add_bytes_to_tarball(tar, name, data=None):
+    """
+    Add file contents (or a directory, if no data is provided) to a tar archive being written
+    :param tar: tarfile.TarFile opened for writing
+    :param name: path of the member within the archive
+    :param data: file contents
+    :type data: bytes
+    """
+    info = tarfile.TarInfo(name)
+    # fixed timestamp (SOURCE_DATE_EPOCH if set), so that exports of the same course are byte-identical
+    info.mtime = int(os.environ.get('SOURCE_DATE_EPOCH', 0))
+    if data is None:
+        info.type = tarfile.DIRTYPE
+        info.mode = 0o755
+        tar.addfile(info)
+    else:
+        info.mode = 0o644
+        info.size = len(data)
+        tar.addfile(info, BytesIO(data))
+
+
+@contextmanager
+def open_tarball(output_filename, compresslevel=9):
+    """
+    Open a .tar.gz archive for writing
+    Compression is piped through pigz (parallel gzip) if it is installed, otherwise done in-process by gzip
+    No timestamp is written to the gzip header, so archives with the same contents are identical
+    (members written by add_bytes_to_tarball also get a fixed mtime)
+    :param output_filename: name of archive file to create
+    :param compresslevel: gzip compression level (1-9)
+    :return: tarfile.TarFile opened for (streamed) writing
+    """
+    pigz = shutil.which('pigz')
+    if not pigz:
+        with open(output_filename, 'wb') as f, \
+                gzip.GzipFile(filename='', mode='wb', fileobj=f, compresslevel=compresslevel, mtime=0) as gz, \
+                tarfile.open(fileobj=gz, mode="w|", bufsize=1 << 20) as tar:
+            yield tar
+        return
+
+    with open(output_filename, 'wb') as f:
+        proc = subprocess.Popen(
+            [pigz, f'-{compresslevel}', '-n', '-p', str(os.cpu_count() or 1)], stdin=subprocess.PIPE, stdout=f
+        )
+        try:
+            with tarfile.open(fileobj=proc.stdin, mode="w|", bufsize=1 << 20) as tar:
+                yield tar
+        finally:
+            proc.stdin.close()
+            returncode = proc.wait()
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, proc.args)
 
 
 class Node:
     """
     Base class for olx nodes
     Subclass this and specify the 'node_type' class attribute in the subclass
+    Nodes use __slots__, since a course can contain thousands of them
     """
+    __slots__ = ('display_name', 'url_name')
+
     def __init__(self, display_name, url_name=None):
         self.display_name = display_name
         self.url_name = url_name
 
+    def to_file(self, target_path, **write_params):
+        """
+        Create xml file in course export folder
+        Generates xml for the node and writes it to file
+        :param target_path: output location
+        :param write_params: xml formatting options to pass to etree.tostring()
+        :return: None
+        """
+        write_xml_to_file(self.to_xml(), target_path, **write_params)
+
+    def to_bytes(self, **write_params):
+        """
+        Generate xml for the node, serialized as file contents
+        :param write_params: xml formatting options to pass to etree.tostring()
+        :rtype: bytes
+        """
+        return xml_to_bytes(self.to_xml(), **write_params)
+
 
 class ParentNode(Node):
     """
     Node that has children. Can be a child of another parent node
     """
+    __slots__ = ('children',)
+
     def __init__(self, display_name, url_name=None, children=None):
         super().__init__(display_name, url_name)
         self.children = children or []
@@ -45,9 +182,12 @@ class ParentNode(Node):
         Generate xml content representing the node
         :rtype: etree.ElementTree
         """
-        root = etree.Element(self.node_type, display_name=str(self.display_name))
-        for child in self.children:
-            child_node = etree.SubElement(root, child.node_type, url_name=str(child.url_name))
+        # build the markup as a string and parse it once, rather than creating each child element separately
+        children = ''.join(f'<{child.node_type} url_name={quoteattr(str(child.url_name))}/>' for child in self.children)
+        root = etree.fromstring(
+            f'<{self.node_type} display_name={quoteattr(str(self.display_name))}>{children}</{self.node_type}>',
+            get_default_parser()
+        )
         return etree.ElementTree(root)
 
 
@@ -55,6 +195,7 @@ class Chapter(ParentNode):
     """
     OLX chapter node. A Chapter contains multiple Sequentials.
     """
+    __slots__ = ()
     node_type = 'chapter'
 
     @property
@@ -66,6 +207,7 @@ class Sequential(ParentNode):
     """
     OLX sequential node. A Sequential contains multiple Verticals.
     """
+    __slots__ = ()
     node_type = 'sequential'
 
     @property
@@ -77,6 +219,7 @@ class Vertical(ParentNode):
     """
     OLX vertical node. A Vertical contains multiple Components.
     """
+    __slots__ = ()
     node_type = 'vertical'
 
     @property
@@ -88,6 +231,7 @@ class Problem(Node):
     """
     OLX problem node ("component"-level)
     """
+    __slots__ = ('body', 'options', 'correct_option', 'explanation', 'max_attempts')
     node_type = 'problem'
 
     def __init__(self, display_name, url_name=None, body=None, options=None, correct_option=None, explanation=None,
@@ -126,9 +270,11 @@ class Problem(Node):
         # question body
         question.append(self._process_body())
         # choices
-        choicegroup = etree.SubElement(question, 'choicegroup')
-        for i, option in enumerate(self.options):
-            etree.SubElement(choicegroup, 'choice', correct=str(i == self.correct_option)).text = option
+        choices = ''.join(
+            f'<choice correct="{i == self.correct_option}">{escape(option) if option is not None else ""}</choice>'
+            for i, option in enumerate(self.options)
+        )
+        question.append(etree.fromstring(f'<choicegroup>{choices}</choicegroup>', get_content_parser()))
         # solution
         solution = etree.SubElement(root, 'solution')
         etree.SubElement(solution, 'p').text = self.explanation
@@ -141,21 +287,20 @@ class Problem(Node):
         :rtype: etree.Element
         """
         text = self.body
-        e = etree.Element('p')
-        lines = [l.strip() for l in text.split('\n')]
-        e.text = lines[0]
-        for line in lines[1:]:
-            br = etree.SubElement(e, 'br')
-            br.tail = line  # put text after <br>
-        return e
+        # build the markup as a string and parse it once, rather than creating each <br> subelement separately
+        lines = (escape(l.strip()) for l in text.split('\n'))
+        return etree.fromstring('<p>' + '<br/>'.join(lines) + '</p>', get_content_parser())
 
 
 class TemplateComponent(Node):
     """
     Component that generates its xml by rendering a template
     """
-    # default parser settings
-    default_parser = etree.XMLParser(remove_blank_text=True)
+    __slots__ = ('template', 'params', 'node_type')
+
+    @property
+    def default_parser(self):
+        return get_content_parser()
 
     def __init__(self, display_name, url_name, template, params, node_type='problem'):
         """
@@ -185,27 +330,21 @@ class TemplateComponent(Node):
         rendered_template = self.render_template()
 
         try:
-            return etree.ElementTree(etree.fromstring(self.render_template()))
-        except Exception as e:
-            print(self.render_template())
-            raise e
-
-    def to_file(self, target_path):
-        """
-        Create xml file in course export folder
-        Renders template and writes xml data to file
-        :param target_path: output location
-        :return: None
-        """
-        write_xml_to_file(self.to_xml(), target_path)
+            return etree.ElementTree(etree.fromstring(rendered_template, self.default_parser))
+        except Exception:
+            log.error('Error parsing rendered template for component %s:\n%s', self.url_name, rendered_template)
+            raise
 
 
 class FileComponent(Node):
     """
     Component that generates its xml by reading from file
     """
-    # default parser settings
-    default_parser = etree.XMLParser(remove_blank_text=True)
+    __slots__ = ('source_path', 'node_type')
+
+    @property
+    def default_parser(self):
+        return get_content_parser()
 
     def __init__(self, source_path, node_type='problem', url_name=None):
         """
@@ -217,25 +356,37 @@ class FileComponent(Node):
 
 
     def to_xml(self):
-        etree.parse(self.source_path, self.default_parser)
+        return etree.parse(self.source_path, self.default_parser)
 
-    def to_file(self, target_path):
+    def to_file(self, target_path, **write_params):
         """
+        Source file is copied as is, so xml formatting options are ignored
         :param target_path: output location
         :return:
         """
         shutil.copyfile(self.source_path, target_path)
 
+    def to_bytes(self, **write_params):
+        """
+        Source file is read as is, so xml formatting options are ignored
+        :return: contents of source file
+        :rtype: bytes
+        """
+        with open(self.source_path, 'rb') as f:
+            return f.read()
+
 
 class Course:
     """
     OLX course. A course contains chapters. Also tracks course-level metadata (start time, labels)
     """
     # default options for xml output formatting
-    xml_formatting = dict(encoding="utf-8", pretty_print=True)
+    xml_formatting = dict(encoding="utf-8", pretty_print=False)
+    # gzip level for exported archives; a low level is much faster, for a small increase in archive size
+    tarball_compresslevel = 3
 
     def __init__(self, display_name=None, org=None, number=None, start='2030-01-01T00:00:00+00:00',
-                 template=None, chapters=[]):
+                 template=None, chapters=None, max_workers=None, pretty_print=False):
         """
         :param name: course display name; optional only if template is provided
         :param org: organization label (optional since course organization is not editable via import)
@@ -243,9 +394,14 @@ class Course:
         :param start: start date/time, defaults to 2030-01-01T00:00:00+00:00
         :param template: course export (location of tarball archive) that can be used as the starting point for a new export
         :param chapters: Chapter objects to include in the course
+        :param max_workers: number of threads used to generate component files during export
+            (ThreadPoolExecutor default if None)
+        :param pretty_print: indent exported xml, e.g. for debugging (exports are not pretty printed by default)
         """
         self.template = template  # path to tar.gz of empty course export
-        self.chapters = chapters
+        self.chapters = list(chapters) if chapters is not None else []
+        self.max_workers = max_workers
+        self.xml_formatting = {**self.xml_formatting, 'pretty_print': pretty_print}
         self.display_name = display_name  # display_name for course
         self.start = start
         # org/number of an existing course is immutable so the values here can be arbitrary,
@@ -274,67 +430,160 @@ class Course:
         Creates folders if needed, overwrites items with same url_name
         Assumes self.chapters is populated (with sequential, vertical etc nested)
         """
+        template = template or self.template
+
+        if as_tarball:
+            # determine new archive name - append .tar.gz if not already part of target name
+            if not output_name:
+                base_filename = template.partition('.tar.gz')[0]
+                output_filename = "{}_modified.tar.gz".format(base_filename)
+            else:
+                output_filename = output_name if output_name.endswith('.tar.gz') else f"{output_name}.tar.gz"
+
+            # create archive
+            self._export_tarball(output_filename, template)
+            return
 
         # create temporary directory to build course export in
-        with tempfile.TemporaryDirectory() as tmpdir:
+        # (next to the target folder, so that the export can be moved into place with a rename rather than a copy)
+        # (prefixed, so that a directory left behind by an interrupted export is recognizable)
+        parent_dir = os.path.dirname(os.path.abspath(output_name))
+        os.makedirs(parent_dir, exist_ok=True)
+        tmpdir = tempfile.mkdtemp(prefix='.olx-export-', dir=parent_dir)
+        try:
 
-            template = template or self.template
             if template:
-                # extract template in temp directory
-                with tarfile.open(template) as f:
+                # extract template in temp directory, reading the archive sequentially as a stream
+                with tarfile.open(template, "r|*") as f:
                     f.extractall(tmpdir)
 
             else:
                 # create base course resources
                 self._build_course_base(tmpdir)
 
-            # shortcut for "top-level" olx course directory
-            course_dir = f'{tmpdir}/course'
+            # shortcut for "top-level" olx course directory, and folders within it
+            course_dir = Path(tmpdir, 'course')
+            course_xml_path = course_dir / 'course' / 'course.xml'
+            chapter_dir, sequential_dir, vertical_dir, problem_dir = (
+                course_dir / folder for folder in ['chapter', 'sequential', 'vertical', 'problem']
+            )
 
             # ensure required folders are present
-            for folder in ['chapter', 'sequential', 'vertical', 'problem']:
-                os.makedirs(os.path.join(course_dir, folder), exist_ok=True)
+            # (course_dir always exists at this point, so a single mkdir per folder is enough)
+            for folder in [chapter_dir, sequential_dir, vertical_dir, problem_dir]:
+                try:
+                    os.mkdir(folder)
+                except FileExistsError:
+                    pass
 
             # build chapters
+            components = []
             for chapter in self.chapters:
-                self._write_to_xml(chapter.to_xml(), f'{course_dir}/chapter/{chapter.url_name}.xml')
+                self._write_to_xml(chapter.to_xml(), chapter_dir / f'{chapter.url_name}.xml', **self.xml_formatting)
 
                 # create nested sequentials
                 for sequential in chapter.sequentials:
-                    self._write_to_xml(sequential.to_xml(), f'{course_dir}/sequential/{sequential.url_name}.xml')
+                    self._write_to_xml(
+                        sequential.to_xml(), sequential_dir / f'{sequential.url_name}.xml', **self.xml_formatting
+                    )
 
                     # create nested verticals
                     for vertical in sequential.verticals:
-                        self._write_to_xml(vertical.to_xml(), f'{course_dir}/vertical/{vertical.url_name}.xml')
+                        self._write_to_xml(
+                            vertical.to_xml(), vertical_dir / f'{vertical.url_name}.xml', **self.xml_formatting
+                        )
+
+                        # collect nested components, which are created concurrently below
+                        components.extend(vertical.components)
 
-                        # create nested components
-                        for problem in vertical.components:
-                            problem.to_file(f'{course_dir}/problem/{problem.url_name}.xml')
+            # create components (the bulk of the course); template parsing and file writes release the GIL
+            def write_component(problem):
+                problem.to_file(problem_dir / f'{problem.url_name}.xml', **self.xml_formatting)
+
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                list(executor.map(write_component, components))
 
             # modify course/course.xml to include chapter references
             # https://lxml.de/FAQ.html#why-doesn-t-the-pretty-print-option-reformat-my-xml-output
-            parser = etree.XMLParser(remove_blank_text=True)
-            course_etree = etree.parse("{}/course/course/course.xml".format(tmpdir), parser)
+            course_etree = etree.parse(str(course_xml_path), get_default_parser())
             course_etree = self._add_chapters(course_etree)
-            course_etree.write("{}/course/course/course.xml".format(tmpdir), **self.xml_formatting)
+            self._write_to_xml(course_etree, course_xml_path, **self.xml_formatting)
+
+            # move temp dir to target folder
+            # if target already exists, remove before writing (os.rename doesn't overwrite)
+            if os.path.isdir(output_name):
+                shutil.rmtree(output_name)
+            try:
+                os.rename(tmpdir, output_name)
+            except OSError:
+                # fall back to copying, e.g. for docker-mounted volumes that don't support rename
+                shutil.copytree(tmpdir, output_name)
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    def _export_tarball(self, output_filename, template=None):
+        """
+        Create course export archive in a single pass, without building the course in a temporary directory first
+        Template contents are copied straight into the new archive, and generated xml is added from memory
+        :param output_filename: name of archive file to create
+        :param template: course export archive to use as the starting point for the new export (optional)
+        """
+        course_xml_path = 'course/course/course.xml'
+        folders = ['course', 'course/course'] + [
+            f'course/{folder}' for folder in ['chapter', 'sequential', 'vertical', 'problem']
+        ]
 
-            if as_tarball:
-                # determine new archive name - append .tar.gz if not already part of target name
-                if not output_name:
-                    base_filename = template.partition('.tar.gz')[0]
-                    output_filename = "{}_modified.tar.gz".format(base_filename)
-                else:
-                    output_filename = output_name if output_name.endswith('.tar.gz') else f"{output_name}.tar.gz"
+        # generated files, as {archive path: node}; these overwrite template items with the same url_name
+        nodes = {}
+        for chapter in self.chapters:
+            nodes[f'course/chapter/{chapter.url_name}.xml'] = chapter
+            for sequential in chapter.sequentials:
+                nodes[f'course/sequential/{sequential.url_name}.xml'] = sequential
+                for vertical in sequential.verticals:
+                    nodes[f'course/vertical/{vertical.url_name}.xml'] = vertical
+                    for problem in vertical.components:
+                        nodes[f'course/problem/{problem.url_name}.xml'] = problem
+
+        with open_tarball(output_filename, self.tarball_compresslevel) as tar:
+            added = set()
+            course_etree = None
+            if template:
+                # copy template contents, except for course/course.xml (modified below) and overwritten items
+                # the template is read as a stream, so each member is passed through as soon as it's read,
+                # without seeking back into the (compressed) archive
+                with tarfile.open(template, "r|*") as source:
+                    for member in source:
+                        name = os.path.normpath(member.name)
+                        if name == course_xml_path:
+                            course_etree = etree.parse(source.extractfile(member), get_default_parser())
+                        elif name not in nodes:
+                            tar.addfile(member, source.extractfile(member) if member.isfile() else None)
+                            added.add(name)
+                if course_etree is None:
+                    raise ValueError(f'Template {template} does not contain {course_xml_path}')
+            else:
+                course_etree = self._build_base_course_xml()
 
-                # create archive
-                self._make_tarfile(output_filename, "{}/course".format(tmpdir))
+            # ensure required folders are present
+            for folder in folders:
+                if folder not in added:
+                    add_bytes_to_tarball(tar, folder)
 
-            # move contents from temp dir to target folder
-            else:
-                # if target already exists, remove before writing (shutil.move doesn't overwrite)
-                if os.path.isdir(output_name):
-                    shutil.rmtree(output_name)
-                shutil.copytree(tmpdir, output_name)  # shutil works better for docker-mounted volumes
+            if not template:
+                # create base course resources
+                add_bytes_to_tarball(
+                    tar, 'course/course.xml', xml_to_bytes(self._build_top_level_course_xml(), **self.xml_formatting)
+                )
+
+            # modify course/course.xml to include chapter references
+            course_etree = self._add_chapters(course_etree)
+            add_bytes_to_tarball(tar, course_xml_path, xml_to_bytes(course_etree, **self.xml_formatting))
+
+            # generate xml concurrently, adding it to the archive in order
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                contents = executor.map(lambda node: node.to_bytes(**self.xml_formatting), nodes.values())
+                for path, data in zip(nodes, contents):
+                    add_bytes_to_tarball(tar, path, data)
 
 
     @staticmethod
@@ -343,19 +592,9 @@ class Course:
         Write etree.ElementTree to file by relative location within course export directory with default formatting
         :param element_tree: etree.ElementTree object
         :param target_path: location to write file to
-        :param kwargs: keyword args to pass to ElementTree.write()
-        """
-        write_params = {'encoding':'utf-8', 'pretty_print':True, **kwargs}
-        element_tree.write(target_path, **write_params)
-
-    def _make_tarfile(self, output_filename, source_dir):
-        """
-        Create tar.gz archive from specified source folder
-        :param output_filename: name of archive file to create
-        :param source_dir: source directory to create archive from
+        :param kwargs: keyword args to pass to etree.tostring()
         """
-        with tarfile.open(output_filename, "w:gz") as tar:
-            tar.add(source_dir, arcname=os.path.basename(source_dir))
+        write_xml_to_file(element_tree, target_path, **kwargs)
 
     def _add_chapters(self, course_etree):
         """
@@ -375,10 +614,10 @@ class Course:
         :param tmpdir: directory to create resources in
         :return:
         """
-        course_dir = os.path.join(tmpdir, 'course')
-        os.makedirs(os.path.join(course_dir, 'course'))
-        self._write_to_xml(self._build_top_level_course_xml(), os.path.join(course_dir, 'course.xml'))
-        self._write_to_xml(self._build_base_course_xml(), os.path.join(course_dir, 'course/course.xml'))
+        course_dir = Path(tmpdir, 'course')
+        os.makedirs(course_dir / 'course')
+        self._write_to_xml(self._build_top_level_course_xml(), course_dir / 'course.xml', **self.xml_formatting)
+        self._write_to_xml(self._build_base_course_xml(), course_dir / 'course' / 'course.xml', **self.xml_formatting)
 
     def _build_top_level_course_xml(self):
         """
@@ -406,14 +645,15 @@ class SheetSource:
     """
     Data source with info about components (possibly content) and how to organize them in export output
     """
-    def __init__(self, df, levels={}):
+    def __init__(self, df, levels=None):
         """
         Download google sheet as dataframe, and standardize column names and values
         :param df: pandas dataframe
         :param levels: dict mapping standard olx heirarchy levels [chapter, sequential, vertical, component]
-            to corresponding column names in sheet. e.g. dict(chapter=part, sequential=lesson, ... )
+            to corresponding column names in sheet. e.g. dict(chapter='part', sequential='lesson', ... )
+            Values can also be callables that take the dataframe and return a column (e.g. to transform values)
         """
-        self.levels = levels
+        self.levels = levels or {}
         self.df = self.prepare_sheet_df(df)
 
     @classmethod
@@ -439,23 +679,27 @@ class SheetSource:
         """
         return cls(pd.read_csv(filename), **kwargs)
 
-    def prepare_sheet_df(self, df, sort_order={}, defaults={}):
+    def prepare_sheet_df(self, df, sort_order=None, defaults=None):
         """
         Clean dataframe, apply any custom column transforms or renaming
         :return: dataframe
         """
         # convert columns to categorical if custom sorting provided
-        for column_to_sort, sorted_values in sort_order.items():
+        for column_to_sort, sorted_values in (sort_order or {}).items():
             df[column_to_sort] = Categorical(df[column_to_sort], sorted_values)
 
         # populate defaults
-        for column, default_value in defaults.items():
+        for column, default_value in (defaults or {}).items():
             if column not in df.columns:
                 df[column] = default_value
 
         # build standard level columns (chapter/sequential/...)
-        # apply callables passed in via levels parameter, to rename columns or apply transforms
-        df = df.assign(**self.levels)
+        # string values are sheet column names, which are copied as is; callables are applied to the whole dataframe
+        # (as column-wise transforms, not per row) by df.assign()
+        levels = {
+            level: df[column] if isinstance(column, str) else column for level, column in self.levels.items()
+        }
+        df = df.assign(**levels)
 
         return df
 
@@ -477,7 +721,7 @@ class OlxCourseBuilder:
     }
 
     def __init__(self, data_source, component_factory, course_params=None,
-                 sort_order={}, url_name=None, template=None):
+                 sort_order=None, url_name=None, template=None):
         """
         #TODO validation checks to scan for blank values (e.g. body)
         :param data: data source object (e.g. GoogleSheetSource)
@@ -503,8 +747,8 @@ class OlxCourseBuilder:
         """
         self.df = data_source.df
         self.component_factory = component_factory
-        self.sort_order = sort_order
-        self.url_name = {**self.url_name, **url_name}
+        self.sort_order = sort_order or {}
+        self.url_name = {**self.url_name, **(url_name or {})}
         self.course_params = course_params
         self.template = template  # course export template
 
@@ -521,36 +765,41 @@ class OlxCourseBuilder:
         # parse spreadsheet of items and create chapter objects (with nested objects)
         course = Course(**self.course_params)
 
-        for chapter_label, chapter_group in self.df.groupby('chapter'):
-            # create a chapter object
-            chapter = Chapter(
-                chapter_label,
-                url_name=self.url_name['chapter'](chapter_label)
-            )
-            for sequential_label, sequential_group in chapter_group.groupby('sequential'):
-                if sequential_group.empty: continue  # in case categorical values are used but group is empty
+        # sort rows once and scan for group boundaries, rather than building nested groupby objects
+        # (stable sort, so rows keep their sheet order within a vertical; rows with missing labels are skipped)
+        levels = ['chapter', 'sequential', 'vertical']
+        df = self.df.dropna(subset=levels).sort_values(levels, kind='stable')
+        labels = [df[level].to_numpy() for level in levels]
+        # is_new[i, j] is True if row j starts a new group at level i, i.e. its label at level i or above changed
+        is_new = np.zeros((len(levels), len(df)), dtype=bool)
+        is_new[:, :1] = True
+        for i, values in enumerate(labels):
+            is_new[i:, 1:] |= values[1:] != values[:-1]
+        new_chapter, new_sequential, new_vertical = is_new
+
+        for i, row in enumerate(df.itertuples()):
+            chapter_label, sequential_label, vertical_label = (values[i] for values in labels)
+            if new_chapter[i]:
+                # create a chapter object
+                chapter = Chapter(
+                    chapter_label,
+                    url_name=self.url_name['chapter'](chapter_label)
+                )
+                course.chapters.append(chapter)
+            if new_sequential[i]:
                 # create a sequential object
                 sequential = Sequential(
                     sequential_label,
                     url_name=self.url_name['sequential'](chapter_label, sequential_label)
                 )
-                # print(f"Created sequential object: {sequential}")
-                for vertical_label, vertical_group in sequential_group.groupby('vertical'):
-                    if vertical_group.empty: continue  # in case categorical values are used but group is empty
-                    # create a vertical object
-                    vertical = Vertical(
-                        vertical_label,
-                        url_name=self.url_name['vertical'](chapter_label, sequential_label, vertical_label)
-                    )
-                    # create problems
-                    for row in vertical_group.itertuples():
-                        # create Problem instance using the component factory
-                        problem = self.component_factory(row)
-                        vertical.components.append(problem)
-                    # append vertical to sequential
-                    sequential.verticals.append(vertical)
-                # append sequential to chapter
                 chapter.sequentials.append(sequential)
-            # append chapter to course-level object
-            course.chapters.append(chapter)
+            if new_vertical[i]:
+                # create a vertical object
+                vertical = Vertical(
+                    vertical_label,
+                    url_name=self.url_name['vertical'](chapter_label, sequential_label, vertical_label)
+                )
+                sequential.verticals.append(vertical)
+            # create Problem instance using the component factory
+            vertical.components.append(self.component_factory(row))
         return course
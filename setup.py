@@ -14,12 +14,10 @@ setup(
     ],
     extras_require={
         'data': [
-            'pandas',
+            'pandas>=2.0',
             'lxml',
             'google-auth>=1.5.0',
             'google-auth-oauthlib>=0.2.0',
-            'gspread>=3.0.0',
-            'gspread-dataframe',
             'cached-property'
         ]
     },
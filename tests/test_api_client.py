@@ -0,0 +1,97 @@
+import json
+import requests
+from requests.adapters import BaseAdapter
+from alosi import api_client
+from alosi.api_client import ApiClient
+
+
+class FakeAdapter(BaseAdapter):
+    """
+    Serves fixed JSON pages with ETags, answering 304 when If-None-Match matches, and records requests
+    """
+    def __init__(self, pages):
+        super().__init__()
+        self.pages = pages  # {url: data}
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        etag = '"{}"'.format(request.url)
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        if request.headers.get('If-None-Match') == etag:
+            response.status_code = 304
+            response._content = b''
+        else:
+            response.status_code = 200
+            response._content = json.dumps(self.pages[request.url]).encode()
+            response.headers['ETag'] = etag
+        return response
+
+    def close(self):
+        pass
+
+
+class FakeApiClient(ApiClient):
+    api_path = '/api'
+
+
+def _make_api(pages):
+    api = FakeApiClient('http://host', token=None)
+    adapter = FakeAdapter(pages)
+    api.client.mount('http://', adapter)
+    return api, adapter
+
+
+def test_request_etag_revalidation():
+    api, adapter = _make_api({'http://host/api/a': {'x': 1}})
+    assert api.request('GET', 'a').json() == {'x': 1}
+    response = api.request('GET', 'a')
+    assert adapter.requests[-1].headers['If-None-Match'] == '"http://host/api/a"'
+    assert response.status_code == 200
+    assert response.json() == {'x': 1}
+
+
+def test_request_etag_cache_bounded(monkeypatch):
+    monkeypatch.setattr(api_client, 'ETAG_CACHE_SIZE', 2)
+    api, adapter = _make_api({'http://host/api/{}'.format(i): {} for i in range(3)})
+    for i in range(3):
+        api.request('GET', str(i))
+    assert [key[0] for key in api._etag_cache] == ['http://host/api/1', 'http://host/api/2']
+
+
+def test_paginate_uses_request():
+    api, adapter = _make_api({
+        'http://host/api/a': {'results': [1], 'next': 'http://host/api/a?page=2'},
+        'http://host/api/a?page=2': {'results': [2], 'next': None},
+    })
+    assert list(api.paginate(api.request('GET', 'a'))) == [1, 2]
+    # next page is revalidated through the etag cache on a repeat listing
+    assert list(api.paginate(api.request('GET', 'a'))) == [1, 2]
+    assert adapter.requests[-1].headers['If-None-Match'] == '"http://host/api/a?page=2"'
+
+
+def test_paginate_rate_limited():
+    """
+    Each next page request takes a token from the rate limiter
+    """
+    api, adapter = _make_api({
+        'http://host/api/a': {'results': [1], 'next': 'http://host/api/a?page=2'},
+        'http://host/api/a?page=2': {'results': [2], 'next': 'http://host/api/a?page=3'},
+        'http://host/api/a?page=3': {'results': [3], 'next': None},
+    })
+    acquired = []
+    api.rate_limiter = api_client.TokenBucket(1000)
+    api.rate_limiter.acquire = lambda: acquired.append(len(adapter.requests))
+    assert list(api.paginate(api.request('GET', 'a'))) == [1, 2, 3]
+    assert acquired == [0, 1, 2]
+
+
+def test_rate_limit_env(monkeypatch):
+    monkeypatch.setenv('ALOSI_REQUEST_RATE', '')
+    assert FakeApiClient('http://host', token=None).rate_limiter is None
+    monkeypatch.setenv('ALOSI_REQUEST_RATE', '5')
+    assert FakeApiClient('http://host', token=None).rate_limiter.rate == 5
+    # explicit rate_limit=0 disables rate limiting set in the environment
+    assert FakeApiClient('http://host', token=None, rate_limit=0).rate_limiter is None
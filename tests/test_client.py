@@ -0,0 +1,104 @@
+import json
+import requests
+from requests.adapters import BaseAdapter
+from urllib.parse import urlparse, parse_qs
+from alosi.client import AlosiClient, KC_LIST_THRESHOLD
+
+
+class FakeEngineAdapter(BaseAdapter):
+    """
+    Minimal in-memory engine knowledge_component endpoint that records requests
+    """
+    def __init__(self, knowledge_components):
+        super().__init__()
+        self.knowledge_components = knowledge_components
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        url = urlparse(request.url)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        if request.method == 'GET':
+            results = [kc for kc in self.knowledge_components if params.get('kc_id', kc['kc_id']) == kc['kc_id']]
+            response.status_code = 200
+            response._content = json.dumps({'results': results, 'next': None}).encode()
+        else:
+            data = dict(json.loads(request.body), id=len(self.knowledge_components) + 1)
+            self.knowledge_components.append(data)
+            response.status_code = 201
+            response._content = json.dumps(data).encode()
+        return response
+
+    def close(self):
+        pass
+
+
+def _make_client(existing):
+    client = AlosiClient(engine_host='http://engine', enabled=['engine'])
+    adapter = FakeEngineAdapter(existing)
+    client.engine_api.client.mount('http://', adapter)
+    return client, adapter
+
+
+def _kc_data(i):
+    return dict(id=i + 1, name='kc{}'.format(i), kc_id='kc{}'.format(i), mastery_prior=0.5)
+
+
+def test_push_knowledge_components_request_count():
+    """
+    Existing KC's are looked up with one list request rather than a GET per KC, and unchanged KC's aren't written
+    """
+    n = KC_LIST_THRESHOLD
+    client, adapter = _make_client([_kc_data(i) for i in range(n)])
+    kcs = [client.KnowledgeComponent(name='kc{}'.format(i), slug='kc{}'.format(i)) for i in range(n)]
+    client._push_knowledge_components(kcs)
+    assert len(adapter.requests) == 1
+    assert all(kc.engine.id == i + 1 for i, kc in enumerate(kcs))
+
+
+def test_push_knowledge_components_below_threshold():
+    """
+    A few KC's are looked up individually, and new KC's are created
+    """
+    client, adapter = _make_client([_kc_data(0)])
+    kcs = [client.KnowledgeComponent(name='kc0', slug='kc0'), client.KnowledgeComponent(name='new', slug='new')]
+    client._push_knowledge_components(kcs)
+    assert sorted((r.method, urlparse(r.url).query) for r in adapter.requests) == [
+        ('GET', 'kc_id=kc0'), ('GET', 'kc_id=new'), ('POST', '')
+    ]
+    assert kcs[1].engine.id == 2
+
+
+def test_push_knowledge_components_empty():
+    client, adapter = _make_client([])
+    client._push_knowledge_components([])
+    assert adapter.requests == []
+
+
+def test_map_concurrently_nested_workers_bounded():
+    """
+    Nested map_concurrently calls share the outermost max_workers
+    """
+    import threading
+    import time
+    from alosi.models import map_concurrently
+    lock = threading.Lock()
+    active = [0]
+    peak = [0]
+
+    def leaf(item):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.01)
+        with lock:
+            active[0] -= 1
+
+    def side(item):
+        map_concurrently(leaf, range(8), 4)
+
+    map_concurrently(lambda item: map_concurrently(side, range(2), 4), range(4), 4)
+    assert 1 < peak[0] <= 4
@@ -5,3 +5,142 @@ def test_import():
     """
     from alosi.engine import BaseAlosiAdaptiveEngine
     assert True
+
+
+def test_knowledge():
+    """
+    Empirical knowledge switches from 0 to 1 at the score that best explains the learner's scores,
+    averaging over tied switch points
+    """
+    import numpy as np
+    from alosi.engine import knowledge
+    scores = np.array([[0, 0, 1], [0, 2, 0], [0, 1, 1], [0, 2, 1], [0, 0, 0.5]])
+    guess = np.array([[0.1, 0.2], [0.3, 0.2], [0.25, 0.15]])
+    slip = np.array([[0.2, 0.1], [0.1, 0.3], [0.05, 0.2]])
+    expected = np.array([[0., 0.5], [0., 0.5], [1., 1.], [1., 1.], [1., 1.]])
+    np.testing.assert_allclose(knowledge(scores, guess, slip), expected)
+
+
+def test_estimate_groups_scores_by_learner():
+    """
+    Score records are grouped by the learner column (learner ids here don't overlap with activity ids)
+    """
+    import numpy as np
+    from alosi.engine import estimate
+    guess = np.full((2, 2), 0.2)
+    slip = np.full((2, 2), 0.1)
+    transit = np.full((2, 2), 0.3)
+    prior = np.array([0.4, 0.4])
+    scores = np.array([[7, 0, 0], [7, 1, 1], [9, 1, 0], [9, 0, 1], [9, 1, 1]])
+    params = estimate(scores, guess, slip, transit, prior, information_threshold=0)
+    assert np.all(np.isfinite(params['L_i_nan']))
+    assert np.all(np.isfinite(params['guess_nan']))
+
+
+def test_calculate_mastery_update():
+    """
+    A correct answer raises mastery odds more than an incorrect one; infinite/zero odds are regularized
+    """
+    import numpy as np
+    from alosi.engine import calculate_mastery_update, odds
+    mastery = np.array([1.0, np.inf, 0.0])
+    guess = np.array([0.2, 0.2, 0.2])
+    slip = np.array([0.1, 0.1, 0.1])
+    transit = np.array([0.1, 0.1, 0.0])
+    correct = calculate_mastery_update(mastery, 1.0, guess, slip, transit)
+    incorrect = calculate_mastery_update(mastery, 0.0, guess, slip, transit)
+    assert correct[0] > incorrect[0]
+    np.testing.assert_allclose(correct[0], 0.1 + 1.1 * slip[0] * (1 + guess[0]) / (1 + slip[0]) / (guess[0] * slip[0]))
+    np.testing.assert_allclose(correct[1:], [odds(1.0), odds(0.0)])
+
+
+def test_update_from_score_caches_factors_until_train():
+    """
+    Guess/slip parameters are only looked up once per activity between training runs
+    """
+    import numpy as np
+    from alosi.engine import BaseAlosiAdaptiveEngine
+
+    class Engine(BaseAlosiAdaptiveEngine):
+        def __init__(self):
+            self.guess = np.full((2, 3), 0.2)
+            self.slip = np.full((2, 3), 0.1)
+            self.mastery = {}
+            self.scores = []
+            self.guess_lookups = 0
+
+        def get_guess(self, activity=None):
+            self.guess_lookups += 1
+            return self.guess if activity is None else self.guess[activity]
+
+        def get_slip(self, activity=None):
+            return self.slip if activity is None else self.slip[activity]
+
+        def get_transit(self, activity=None):
+            transit = np.full((2, 3), 0.1)
+            return transit if activity is None else transit[activity]
+
+        def get_mastery_prior(self):
+            return np.full(3, 0.5)
+
+        def get_learner_mastery(self, learner):
+            return self.mastery.get(learner, np.ones(3))
+
+        def update_learner_mastery(self, learner, new_mastery):
+            self.mastery[learner] = new_mastery
+
+        def save_score(self, learner, activity, score):
+            self.scores.append([learner, activity, score])
+
+        def get_scores(self):
+            return np.array(self.scores)
+
+        def update_guess(self, new_guess):
+            self.guess = new_guess
+
+        def update_slip(self, new_slip):
+            self.slip = new_slip
+
+        def update_transit(self, new_transit):
+            pass
+
+    engine = Engine()
+    for learner, activity, score in [(0, 0, 1.0), (0, 1, 0.0), (1, 0, 0.0), (1, 1, 1.0)]:
+        engine.update_from_score(learner, activity, score)
+    assert engine.guess_lookups == 2
+    engine.train(information_threshold=0)
+    engine.update_from_score(0, 0, 1.0)
+    assert engine.guess_lookups == 4  # one full lookup for training, then activity 0 again
+
+
+def test_fillna():
+    """
+    Non-finite values are replaced with a scalar or the corresponding elements of an array; inplace modifies x
+    """
+    import numpy as np
+    from alosi.engine import fillna
+    x = np.array([1.0, np.nan, np.inf, -np.inf])
+    np.testing.assert_array_equal(fillna(x, 0.5), [1.0, 0.5, 0.5, 0.5])
+    assert np.isnan(x[1])
+    assert fillna(x, np.array([5.0, 6.0, 7.0, 8.0]), inplace=True) is None
+    np.testing.assert_array_equal(x, [1.0, 6.0, 7.0, 8.0])
+
+
+def test_recommendation_score_batch():
+    """
+    Scoring several learners at once gives the same scores as scoring each learner separately
+    """
+    import numpy as np
+    from alosi.engine import recommendation_score
+    rng = np.random.default_rng(0)
+    params = dict(guess=rng.uniform(0.05, 0.4, (5, 3)), slip=rng.uniform(0.05, 0.4, (5, 3)),
+                  prereqs=rng.uniform(0, 1, (3, 3)), difficulty=rng.uniform(0, 1, 5),
+                  r_star=0.0, L_star=2.2, W_p=5.0, W_r=3.0, W_d=1.0, W_c=0.5)
+    learner_mastery = rng.uniform(0.1, 10, (4, 3))
+    last_attempted_relevance = rng.uniform(0, 3, (4, 3))
+    scores = recommendation_score(learner_mastery=learner_mastery, last_attempted_relevance=last_attempted_relevance,
+                                  **params)
+    assert scores.shape == (5, 4)
+    for i in range(4):
+        np.testing.assert_allclose(scores[:, i], recommendation_score(
+            learner_mastery=learner_mastery[i], last_attempted_relevance=last_attempted_relevance[i], **params))
@@ -0,0 +1,70 @@
+import os
+
+
+def test_values_to_dataframe_ragged_rows():
+    """
+    Rows with cells right of the header, and rows missing trailing empty cells, are padded like the csv export
+    """
+    import numpy as np
+    from alosi.google_drive import _values_to_dataframe
+    # cell right of the header in a later row
+    df = _values_to_dataframe([['a', 'b'], ['1', 'x'], ['2', 'y', 'note'], ['3']])
+    assert list(df.columns) == ['a', 'b', 'Unnamed: 2']
+    assert list(df['a']) == [1, 2, 3]
+    assert df['b'].tolist()[:2] == ['x', 'y'] and np.isnan(df['b'][2])
+    assert df['Unnamed: 2'].tolist()[1] == 'note'
+    # cell right of the header in the first data row (must not become the index)
+    df = _values_to_dataframe([['a', 'b'], ['1', 'x', 'note'], ['2']])
+    assert list(df.columns) == ['a', 'b', 'Unnamed: 2']
+    assert list(df.index) == [0, 1]
+    assert list(df['a']) == [1, 2]
+
+
+def test_export_sheet_to_dataframe_cache_key(tmpdir, monkeypatch):
+    """
+    Cached dataframes are keyed by file id, (quoted) worksheet title and drive file version
+    """
+    from pandas import DataFrame
+    from alosi import google_drive
+    exports = []
+    version = ['1']
+
+    def export(file_id, credentials, worksheet_title=None):
+        exports.append((file_id, worksheet_title))
+        return DataFrame({'a': [1, 2]})
+
+    monkeypatch.setattr(google_drive, '_export_sheet_to_dataframe', export)
+    monkeypatch.setattr(google_drive, '_get_file_version', lambda file_id, credentials: version[0])
+    cache_dir = str(tmpdir)
+
+    df = google_drive.export_sheet_to_dataframe('f', None, worksheet_title="It's/1", cache_dir=cache_dir)
+    assert os.listdir(cache_dir) == ['f-It%27s%2F1-1.pkl']
+    # cache hit
+    assert google_drive.export_sheet_to_dataframe('f', None, worksheet_title="It's/1", cache_dir=cache_dir).equals(df)
+    assert len(exports) == 1
+    # other worksheet, or new file version, is a cache miss
+    google_drive.export_sheet_to_dataframe('f', None, cache_dir=cache_dir)
+    version[0] = '2'
+    google_drive.export_sheet_to_dataframe('f', None, worksheet_title="It's/1", cache_dir=cache_dir)
+    assert exports == [('f', "It's/1"), ('f', None), ('f', "It's/1")]
+    assert sorted(os.listdir(cache_dir)) == ['f--1.pkl', 'f-It%27s%2F1-1.pkl', 'f-It%27s%2F1-2.pkl']
+
+
+def test_export_sheet_to_dataframe_failed_cache_write(tmpdir, monkeypatch):
+    """
+    A cache write that fails part way leaves no cache file behind
+    """
+    import pytest
+    from pandas import DataFrame
+    from alosi import google_drive
+
+    def to_pickle(self, path):
+        path.write(b'partial')
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(google_drive, '_export_sheet_to_dataframe', lambda *args: DataFrame({'a': [1]}))
+    monkeypatch.setattr(google_drive, '_get_file_version', lambda file_id, credentials: '1')
+    monkeypatch.setattr(DataFrame, 'to_pickle', to_pickle)
+    with pytest.raises(KeyboardInterrupt):
+        google_drive.export_sheet_to_dataframe('f', None, cache_dir=str(tmpdir))
+    assert tmpdir.listdir() == []
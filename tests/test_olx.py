@@ -0,0 +1,100 @@
+import os
+import tarfile
+import time
+import pytest
+from lxml import etree
+from alosi.olx import Course, Chapter, Sequential, Vertical, Problem, TemplateComponent, FileComponent
+
+
+def _make_course():
+    problems = [
+        Problem('q{}'.format(i), url_name='q{}'.format(i), body='body', options=['a', 'b'], correct_option=0,
+                explanation='')
+        for i in range(2)
+    ]
+    vertical = Vertical('v', url_name='v', children=problems)
+    sequential = Sequential('s', url_name='s', children=[vertical])
+    return Course(display_name='Test', chapters=[Chapter('c', url_name='c', children=[sequential])])
+
+
+def test_export_tarball_reproducible(tmpdir, monkeypatch):
+    """
+    Exporting the same course at different times produces byte-identical archives
+    """
+    monkeypatch.delenv('SOURCE_DATE_EPOCH', raising=False)
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now)
+    _make_course().export(output_name=str(tmpdir.join('a')), as_tarball=True)
+    monkeypatch.setattr(time, 'time', lambda: now + 3600)
+    _make_course().export(output_name=str(tmpdir.join('b')), as_tarball=True)
+    assert tmpdir.join('a.tar.gz').read_binary() == tmpdir.join('b.tar.gz').read_binary()
+
+
+def test_export_tarball_source_date_epoch(tmpdir, monkeypatch):
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', '1000')
+    _make_course().export(output_name=str(tmpdir.join('a')), as_tarball=True)
+    with tarfile.open(str(tmpdir.join('a.tar.gz'))) as tar:
+        assert {member.mtime for member in tar} == {1000}
+
+
+def test_export_tarball_matches_directory(tmpdir):
+    """
+    Tarball export contains the same files, with the same contents, as a directory export
+    """
+    _make_course().export(output_name=str(tmpdir.join('course_dir')), as_tarball=False)
+    _make_course().export(output_name=str(tmpdir.join('course')), as_tarball=True)
+    root = str(tmpdir.join('course_dir'))
+    directory_files = {}
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            with open(path, 'rb') as f:
+                directory_files[os.path.relpath(path, root)] = f.read()
+    with tarfile.open(str(tmpdir.join('course.tar.gz'))) as tar:
+        tarball_files = {member.name: tar.extractfile(member).read() for member in tar if member.isfile()}
+    assert 'course/problem/q0.xml' in tarball_files
+    assert tarball_files == directory_files
+
+
+class _Template:
+    def __init__(self, text):
+        self.text = text
+
+    def render(self, params):
+        return self.text.format(**params)
+
+
+def test_export_template_keeps_inline_whitespace(tmpdir):
+    """
+    Whitespace between inline elements in rendered template content is preserved
+    """
+    template = _Template('<problem><p><b>{a}</b> <i>{b}</i></p></problem>')
+    component = TemplateComponent('t', 't', template, dict(a='a', b='b'))
+    vertical = Vertical('v', url_name='v', children=[component])
+    course = Course(display_name='Test', chapters=[
+        Chapter('c', url_name='c', children=[Sequential('s', url_name='s', children=[vertical])])
+    ])
+    course.export(output_name=str(tmpdir.join('course')), as_tarball=False)
+    assert b'<b>a</b> <i>b</i>' in tmpdir.join('course', 'course', 'problem', 't.xml').read_binary()
+
+
+def test_file_component_keeps_inline_whitespace(tmpdir):
+    source = tmpdir.join('q.xml')
+    source.write('<problem><p><b>a</b> <i>b</i></p></problem>')
+    xml = etree.tostring(FileComponent(str(source), url_name='q').to_xml())
+    assert b'<b>a</b> <i>b</i>' in xml
+
+
+def test_export_directory_creates_parent(tmpdir):
+    output_dir = tmpdir.join('out', 'new', 'course')
+    _make_course().export(output_name=str(output_dir), as_tarball=False)
+    assert output_dir.join('course', 'course.xml').check()
+    assert tmpdir.join('out', 'new').listdir() == [output_dir]
+
+
+def test_export_tarball_template_without_course_xml(tmpdir):
+    template = str(tmpdir.join('template.tar.gz'))
+    with tarfile.open(template, 'w:gz') as tar:
+        tar.add(__file__, arcname='course/about.txt')
+    with pytest.raises(ValueError, match='course/course/course.xml'):
+        _make_course().export(output_name=str(tmpdir.join('course')), template=template, as_tarball=True)